@@ -1,28 +1,48 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, Response, stream_with_context, g, send_file
 import os
 import uuid
 import json
 import shutil
+import hmac
 import bcrypt
 from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 from dateutil import parser
 from flask import Flask, render_template, request, redirect, url_for, session, jsonify
 import os, uuid, json
 from datetime import datetime
-from utils.parsers import parse_input_file
+from multiprocessing import parent_process
+from utils.parsers import parse_input_file, iter_zip_documents, count_zip_members
 from utils.title_suggested import suggest_titles
-from utils.llm_formatter import generate_ieee_markdown
+from utils.llm_formatter import generate_ieee_markdown, stream_ieee_markdown
 from utils.latex_formatter import generate_pdf_from_data
+from utils.jobs import JobQueue, JobFailed, MAX_CONCURRENT_JOBS
+from utils.warmup import start_warmup
+from utils.image_store import ingest_document_images
+from utils.doc_store import get_store, RevisionConflict
+from utils.serving import run_blocking, iterate_blocking, run_db
+from utils.metrics import render_metrics, mongo_listener, UPLOAD_BYTES
+from utils import profiling
 from werkzeug.utils import secure_filename
 
 
 # ===========================================
 # 🔗 MongoDB setup
 # ===========================================
-client = MongoClient("mongodb://localhost:27017/")
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+client = MongoClient(MONGO_URI, connect=False, event_listeners=[mongo_listener()])
 db = client['authdb']
 users_collection = db['users']
+uploads_collection = db['uploads']
+
+# Uploads listed per dashboard page, and the fields the list needs
+DASHBOARD_PAGE_SIZE = 20
+UPLOAD_LIST_FIELDS = {"_id": 0, "temp_id": 1, "file_name": 1, "title": 1, "parsed_on": 1}
+
+# Indexes and the users.uploads migration are set up once with
+# `python setup_db.py`, not on every start
+
 
 # ===========================================
 # 🔧 Flask setup
@@ -35,7 +55,24 @@ app.secret_key = 'dev-key-93c1745e3f2342c9bfa814bcdf2fd819'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(TEMP_FOLDER, exist_ok=True)
+
+# Spawned parser processes (ZIP uploads) re-import the main script, and
+# with it this module; startup work below is for the server process only
+SERVER_PROCESS = parent_process() is None
+
+# Parsed documents live in the SQLite document store; older uploads saved
+# as temp_data/<temp_id>.json are imported on startup
+doc_store = get_store()
+if SERVER_PROCESS and os.path.isdir(TEMP_FOLDER):
+    doc_store.migrate_json_files(TEMP_FOLDER)
+
+# Uploads are parsed in a bounded worker pool, outside the request thread
+job_queue = JobQueue(max_workers=MAX_CONCURRENT_JOBS)
+
+# Heavy parser libraries load lazily; set IEEE_WARMUP=1 to preload them,
+# the spaCy model and the local LLMs in the background at startup
+if SERVER_PROCESS and os.environ.get("IEEE_WARMUP") == "1":
+    start_warmup()
 
 # ===========================================
 # 🔐 Authentication routes
@@ -48,17 +85,19 @@ def signup():
     password = data.get('password')
     phone = data.get('phone')
 
-    if users_collection.find_one({'email': email}):
+    if run_db(users_collection.find_one, {'email': email}, {"_id": 1}):
         return jsonify({"success": False, "message": "User already exists"})
 
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-    users_collection.insert_one({
-        "name": name,
-        "email": email,
-        "password": hashed_password,
-        "phone": phone,
-        "uploads": []
-    })
+    hashed_password = run_blocking(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+    try:
+        run_db(users_collection.insert_one, {
+            "name": name,
+            "email": email,
+            "password": hashed_password,
+            "phone": phone
+        })
+    except DuplicateKeyError:
+        return jsonify({"success": False, "message": "User already exists"})
 
     return jsonify({"success": True, "message": "Signup successful", "redirect": "/login.html"})
 
@@ -69,8 +108,8 @@ def login():
     email = data.get('email')
     password = data.get('password')
 
-    user = users_collection.find_one({"email": email})
-    if user and bcrypt.checkpw(password.encode('utf-8'), user["password"]):
+    user = run_db(users_collection.find_one, {"email": email})
+    if user and run_blocking(bcrypt.checkpw, password.encode('utf-8'), user["password"]):
         session['user'] = user['email']
         return jsonify({'success': True, 'message': 'Login successful', 'redirect': '/dashboard'})
     else:
@@ -109,9 +148,26 @@ def dashboard():
     if 'user' not in session:
         return redirect(url_for('login_page'))
 
-    user = users_collection.find_one({"email": session["user"]})
-    uploads = user.get("uploads", [])
-    return render_template('dashboard.html', uploads=uploads)
+    return render_dashboard(request.args.get("page", 1, type=int))
+
+
+def render_dashboard(page=1, error=None):
+    """One page of the user's uploads, newest first"""
+    owner = {"owner": session["user"]}
+    total = run_db(uploads_collection.count_documents, owner)
+    pages = max(1, -(-total // DASHBOARD_PAGE_SIZE))
+    page = min(max(1, page), pages)
+
+    def fetch_page():
+        return list(
+            uploads_collection.find(owner, UPLOAD_LIST_FIELDS)
+            .sort([("parsed_on", -1), ("_id", -1)])
+            .skip((page - 1) * DASHBOARD_PAGE_SIZE)
+            .limit(DASHBOARD_PAGE_SIZE)
+        )
+
+    uploads = run_db(fetch_page)
+    return render_template('dashboard.html', uploads=uploads, page=page, pages=pages, total=total, error=error)
 
 @app.route('/index.html')
 def index():
@@ -122,6 +178,100 @@ def index():
 # ========================
 # 📤 File Upload + Parsing
 # ========================
+UPLOAD_STAGES = ["parsing", "titles", "images", "saving"]
+
+
+# ZIP uploads report progress as papers finish rather than per stage
+ZIP_UPLOAD_STAGES = ["papers"]
+
+
+def run_upload_pipeline(job, file_path, file_name, email):
+    """Parse an uploaded file in the background and register it for the user"""
+    # 🧠 Parse the file (should extract text + image paths)
+    job.set_stage("parsing")
+    parsed_data = parse_input_file(file_path)
+    if not parsed_data or "error" in parsed_data:
+        raise JobFailed((parsed_data or {}).get("error", "Unknown error"))
+
+    temp_id = register_document(job, parsed_data, file_name, email)
+    return {"temp_ids": [temp_id]}
+
+
+def run_zip_pipeline(job, file_path, file_name, email):
+    """Parse every paper in an uploaded ZIP and register each one as its own upload"""
+    job.set_stage("papers")
+    total = count_zip_members(file_path)
+    if not total:
+        raise JobFailed("ZIP contains no PDF, DOCX or DOC files")
+
+    temp_ids, skipped = [], []
+    papers = iter_zip_documents(file_path)
+    try:
+        # 📦 Papers arrive as soon as each one is parsed
+        for done, (member_name, parsed_data) in enumerate(papers, start=1):
+            member_file = os.path.basename(member_name)
+            if not parsed_data or "error" in parsed_data:
+                skipped.append({"file_name": member_file, "error": (parsed_data or {}).get("error", "Unknown error")})
+            else:
+                temp_ids.append(register_document(job, parsed_data, member_file, email, track_stages=False))
+            job.set_progress(done / total)
+    finally:
+        # Stops queued parses if the job was cancelled
+        papers.close()
+
+    if not temp_ids:
+        raise JobFailed(f"No paper in {file_name} could be parsed")
+    return {"temp_ids": temp_ids, "skipped": skipped}
+
+
+def register_document(job, parsed_data, file_name, email, track_stages=True):
+    """Suggest titles, store images and parsed data, and log the upload; returns the temp_id"""
+    def stage(name):
+        if track_stages:
+            job.set_stage(name)
+        else:
+            job.check_cancelled()
+
+    # 🎯 Title suggestion
+    stage("titles")
+    titles = suggest_titles(parsed_data)
+    temp_id = str(uuid.uuid4())
+
+    # 🖼️ Store images once per content hash, downscaled for print, in parallel
+    stage("images")
+    ingest_document_images(parsed_data, job.set_progress if track_stages else None)
+
+    # 💾 Save parsed data to the document store
+    stage("saving")
+    doc_store.create(temp_id, parsed_data)
+
+    # 📚 Log upload in DB (on the MongoDB thread under gevent, like every query)
+    run_db(uploads_collection.insert_one, {
+        "owner": email,
+        "file_name": file_name,
+        "temp_id": temp_id,
+        "parsed_on": datetime.utcnow(),
+        "title": titles[0] if titles else "Untitled"
+    })
+
+    return temp_id
+
+
+def owns_upload(temp_id):
+    """Whether temp_id names one of the signed-in user's uploads"""
+    if not isinstance(temp_id, str):
+        return False
+    return run_db(uploads_collection.find_one, {"owner": session["user"], "temp_id": temp_id}, {"_id": 1}) is not None
+
+
+def discard_upload(file_path):
+    """Remove an uploaded file once its job has finished with it"""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
 @app.route('/upload', methods=['POST'])
 def upload():
     if 'user' not in session:
@@ -131,77 +281,84 @@ def upload():
     if not uploaded_file:
         return jsonify({"error": "No file uploaded"}), 400
 
-    # 🧾 Save uploaded file temporarily
-    filename = secure_filename(uploaded_file.filename)
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    # 🧾 Save uploaded file temporarily, under a name of its own: jobs run
+    # later, so two uploads of "paper.pdf" must not overwrite each other
+    extension = os.path.splitext(secure_filename(uploaded_file.filename))[1].lower()
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}{extension}")
     uploaded_file.save(file_path)
+    UPLOAD_BYTES.observe(
+        os.path.getsize(file_path),
+        file_type=extension.lstrip('.') if extension in ('.pdf', '.docx', '.doc', '.zip') else "other"
+    )
 
-    try:
-        # 🧠 Parse the file (should extract text + image paths)
-        parsed_data = parse_input_file(file_path)
-        if not parsed_data or "error" in parsed_data:
-            return jsonify({"error": parsed_data.get("error", "Unknown error")}), 400
-
-        # 🎯 Title suggestion
-        titles = suggest_titles(parsed_data)
-        temp_id = str(uuid.uuid4())
-
-        # 📁 Create static image folder for this document
-        image_folder = os.path.join("static", "images", temp_id)
-        os.makedirs(image_folder, exist_ok=True)
-
-        # ✅ Ensure all image paths are valid and convert to PNG
-        valid_images = []
-        for img in parsed_data.get("images", []):
-            original_path = img.get("path")
-            if not original_path or not os.path.exists(original_path):
-                continue
+    # ⏳ Hand the heavy lifting to the worker pool
+    if extension == '.zip':
+        stages, pipeline = ZIP_UPLOAD_STAGES, run_zip_pipeline
+    else:
+        stages, pipeline = UPLOAD_STAGES, run_upload_pipeline
+    # 🔬 Profile the background pipeline too when this request is profiled
+    # (sampled, so its thread pools are included; child processes are not)
+    job_profile = None
+    if "profile" in g:
+        job_profile, pipeline = profiling.profile_job(pipeline.__name__, session['user'], pipeline)
+
+    job = job_queue.submit(
+        session['user'], stages, pipeline,
+        file_path, uploaded_file.filename, session['user']
+    )
+    job.add_done_callback(lambda job: discard_upload(file_path))
+    response = {
+        "job_id": job.id,
+        "status_url": url_for('job_status', job_id=job.id)
+    }
+    if job_profile:
+        response["job_profile_id"] = job_profile.id
+    return jsonify(response), 202
 
-            try:
-                ext = os.path.splitext(original_path)[1].lower()
-                basename = os.path.splitext(os.path.basename(original_path))[0]
-                new_path = os.path.join(image_folder, f"{basename}.png")
+# ========================
+# ⏳ Background Jobs
+# ========================
+def get_user_job(job_id):
+    job = job_queue.get(job_id)
+    if not job or job.owner != session.get('user'):
+        return None
+    return job
 
-                # Always convert using Pillow to ensure compatibility
-                with Image.open(original_path) as im:
-                    im.convert("RGB").save(new_path, "PNG")
 
-                img["path"] = f"/static/images/{temp_id}/{basename}.png"
-                valid_images.append(img)
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    if 'user' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
 
-            except Exception as e:
-                print(f"[SKIP] Failed to process image {original_path}: {e}")
-                continue
-
-        parsed_data["images"] = valid_images
-
-        # 💾 Save parsed data to temp storage
-        temp_path = os.path.join(TEMP_FOLDER, f"{temp_id}.json")
-        with open(temp_path, "w", encoding="utf-8") as f:
-            json.dump(parsed_data, f, ensure_ascii=False, indent=2)
-
-        # 🔐 Save session token
-        session['temp_id'] = temp_id
-
-        # 📚 Log upload in DB
-        email = session['user']
-        uploads_entry = {
-            "file_name": uploaded_file.filename,
-            "temp_id": temp_id,
-            "parsed_on": datetime.utcnow(),
-            "title": titles[0] if titles else "Untitled"
-        }
-
-        users_collection.update_one(
-            {"email": email},
-            {"$push": {"uploads": uploads_entry}}
-        )
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    status = job.to_dict()
+    if job.status == "done":
+        temp_ids = job.result["temp_ids"]
+        status["skipped"] = job.result.get("skipped", [])
+        if len(temp_ids) == 1:
+            # 🔐 Open the finished document in the editor
+            session['temp_id'] = temp_ids[0]
+            status["redirect"] = url_for("editor")
+        else:
+            # 📚 A batch lands on the dashboard, one upload per paper
+            status["redirect"] = url_for("dashboard")
+    return jsonify(status)
+
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if 'user' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
 
-        return redirect(url_for("editor"))
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
 
-    except Exception as e:
-        print("UPLOAD ERROR:", str(e))
-        return jsonify({"error": "Internal server error"}), 500
+    job.cancel()
+    return jsonify(job.to_dict())
 
 # ========================
 # 📝 Editor View
@@ -215,14 +372,11 @@ def editor():
     if not temp_id:
         return "Missing session data", 400
 
-    temp_path = os.path.join(TEMP_FOLDER, f"{temp_id}.json")
-    if not os.path.exists(temp_path):
+    parsed_data, revision = doc_store.load(temp_id)
+    if parsed_data is None:
         return "Parsed document not found", 400
 
-    with open(temp_path, "r", encoding="utf-8") as f:
-        parsed_data = json.load(f)
-
-    return render_template('editor.html', parsed=parsed_data)
+    return render_template('editor.html', parsed=parsed_data, revision=revision, temp_id=temp_id)
 
 # ========================
 # 🔁 Resume Editing
@@ -232,22 +386,20 @@ def resume(temp_id):
     if 'user' not in session:
         return redirect(url_for('login_page'))
 
-    temp_path = os.path.join(TEMP_FOLDER, f"{temp_id}.json")
-    if not os.path.exists(temp_path):
-        users_collection.update_one(
-            {"email": session["user"]},
-            {"$pull": {"uploads": {"temp_id": temp_id}}}
-        )
-        user = users_collection.find_one({"email": session["user"]})
-        uploads = user.get("uploads", [])
-        return render_template("dashboard.html", uploads=uploads, error="Parsed file not found. Please upload again.")
+    if not run_db(uploads_collection.find_one, {"owner": session["user"], "temp_id": temp_id}, {"_id": 1}):
+        return render_dashboard(error="Upload not found.")
 
-    session['temp_id'] = temp_id
-    with open(temp_path, "r", encoding="utf-8") as f:
-        parsed_data = json.load(f)
+    parsed_data, revision = doc_store.load(temp_id)
+    if parsed_data is None:
+        run_db(uploads_collection.delete_one, {"owner": session["user"], "temp_id": temp_id})
+        return render_dashboard(error="Parsed file not found. Please upload again.")
 
+    session['temp_id'] = temp_id
     markdown = parsed_data.get("edited_markdown")
-    return render_template("editor.html", parsed=parsed_data, saved_markdown=markdown, from_dashboard=True)
+    return render_template(
+        "editor.html", parsed=parsed_data, revision=revision, temp_id=temp_id,
+        saved_markdown=markdown, from_dashboard=True
+    )
 
 # ========================
 # 📄 Markdown + PDF Gen
@@ -257,46 +409,147 @@ def generate_ieee():
     if 'user' not in session:
         return jsonify({"error": "Unauthorized"}), 401
 
-    temp_id = session.get('temp_id')
+    body = request.get_json(silent=True) or {}
+    temp_id = body.get("temp_id") or request.args.get("temp_id")
     if not temp_id:
         return jsonify({"error": "Missing parsed document data"}), 400
+    if not owns_upload(temp_id):
+        return jsonify({"error": "Parsed document not found"}), 404
 
-    temp_path = os.path.join(TEMP_FOLDER, f"{temp_id}.json")
-    if not os.path.exists(temp_path):
-        return jsonify({"error": "Parsed document not found"}), 400
+    parsed_data, _ = doc_store.load(temp_id)
+    if parsed_data is None:
+        return jsonify({"error": "Parsed document not found"}), 404
 
-    with open(temp_path, "r", encoding="utf-8") as f:
-        parsed_data = json.load(f)
+    # ♻️ Cached answers are reused unless the client asks for a fresh one
+    refresh = bool(body.get("refresh")) or request.args.get("refresh") == "1"
 
     try:
-        markdown = generate_ieee_markdown(parsed_data)
+        markdown = run_blocking(generate_ieee_markdown, parsed_data, refresh=refresh)
         return jsonify({"markdown": markdown})
     except Exception as e:
         return jsonify({"error": f"Error generating IEEE markdown: {str(e)}"}), 500
 
 
+@app.route('/generate_ieee/stream')
+def generate_ieee_stream():
+    if 'user' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    temp_id = request.args.get("temp_id")
+    if not temp_id:
+        return jsonify({"error": "Missing parsed document data"}), 400
+    if not owns_upload(temp_id):
+        return jsonify({"error": "Parsed document not found"}), 404
+
+    parsed_data, _ = doc_store.load(temp_id)
+    if parsed_data is None:
+        return jsonify({"error": "Parsed document not found"}), 404
+
+    refresh = request.args.get("refresh") == "1"
+
+    # 📡 Forward tokens as Server-Sent Events; if the client goes away the
+    # generator is closed, which drops the connection to the model
+    def events():
+        tokens = iterate_blocking(stream_ieee_markdown(parsed_data, refresh=refresh))
+        try:
+            for token in tokens:
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            error = json.dumps({"error": f"Error generating IEEE markdown: {str(e)}"})
+            yield f"event: failed\ndata: {error}\n\n"
+        finally:
+            tokens.close()
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ========================
+# 💾 Autosave
+# ========================
+@app.route('/document', methods=['PATCH'])
+def save_document():
+    """
+    Apply section-level changes to the open document:
+    {"temp_id": id, "revision": n, "meta": {field: value}, "sections": {"<index>": section}, "section_count": n}
+    The document is named in the body, not taken from the session, so a
+    second tab opening another upload cannot redirect this tab's saves.
+    Fails with 409 and the current revision if someone saved in between.
+    """
+    if 'user' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or "revision" not in body:
+        return jsonify({"error": "Expected JSON with a revision"}), 400
+
+    temp_id = body.get("temp_id")
+    if not temp_id:
+        return jsonify({"error": "Missing parsed document data"}), 400
+    if not owns_upload(temp_id):
+        return jsonify({"error": "Parsed document not found"}), 404
+
+    try:
+        revision = doc_store.apply_changes(
+            temp_id, body["revision"],
+            meta=body.get("meta"), sections=body.get("sections"), section_count=body.get("section_count")
+        )
+    except RevisionConflict as e:
+        return jsonify({"error": "Document was changed elsewhere", "revision": e.current_revision}), 409
+    except KeyError:
+        return jsonify({"error": "Parsed document not found"}), 404
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({"error": f"Invalid changes: {str(e)}"}), 400
+
+    return jsonify({"revision": revision})
+
+
 @app.route('/generate_pdf', methods=['POST'])
 def generate_pdf():
     if 'user' not in session:
         return jsonify({"error": "Unauthorized"}), 401
 
-    data = request.get_json()
-    if not data:
+    """
+    {"temp_id": id} compiles the saved copy of that document;
+    {"temp_id": id, "data": parsed} saves the edited version first.
+    A body without temp_id is a whole parsed document, compiled unsaved.
+    """
+    body = request.get_json(silent=True)
+    if not body or not isinstance(body, dict):
         return jsonify({"error": "No data received"}), 400
 
-    # Save the latest edited version to temp file
-    temp_id = session.get("temp_id")
-    if temp_id:
-        temp_path = os.path.join(TEMP_FOLDER, f"{temp_id}.json")
-        try:
-            with open(temp_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            return jsonify({"error": f"Failed to save temp data: {str(e)}"}), 500
+    revision = None
+    if "temp_id" not in body:
+        data = body
+    else:
+        temp_id = body["temp_id"]
+        if not temp_id or not owns_upload(temp_id):
+            return jsonify({"error": "Parsed document not found"}), 404
+
+        data = body.get("data")
+        if data is None:
+            # 📄 Compile the saved copy of the document
+            data, revision = doc_store.load(temp_id)
+            if data is None:
+                return jsonify({"error": "Parsed document not found"}), 404
+        else:
+            # Save the latest edited version; only changed sections are rewritten
+            try:
+                revision = doc_store.save(temp_id, data)
+            except KeyError:
+                return jsonify({"error": "Parsed document not found"}), 404
+            except Exception as e:
+                return jsonify({"error": f"Failed to save temp data: {str(e)}"}), 500
 
     # Generate the PDF
     try:
-        result = generate_pdf_from_data(data)
+        result = run_blocking(generate_pdf_from_data, data)
+        if revision is not None:
+            result["revision"] = revision
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": f"PDF generation failed: {str(e)}"}), 500
@@ -311,13 +564,13 @@ def delete_upload(temp_id):
 
     email = session['user']
 
-    # Remove from MongoDB
-    users_collection.update_one(
-        {"email": email},
-        {"$pull": {"uploads": {"temp_id": temp_id}}}
-    )
+    # Remove from MongoDB; only the owner's own uploads can be deleted
+    deleted = run_db(uploads_collection.delete_one, {"owner": email, "temp_id": temp_id}).deleted_count
+    if not deleted:
+        return redirect(url_for("dashboard"))
 
-    # Remove temp file
+    # Remove the stored document (and any pre-migration JSON file)
+    doc_store.delete(temp_id)
     temp_path = os.path.join(TEMP_FOLDER, f"{temp_id}.json")
     if os.path.exists(temp_path):
         os.remove(temp_path)
@@ -326,6 +579,81 @@ def delete_upload(temp_id):
 
 
 
+# ========================
+# 📈 Metrics
+# ========================
+# Bearer token Prometheus sends to scrape /metrics; unset turns the route off.
+# The client address is no use here: behind a reverse proxy on the same host
+# every request comes from 127.0.0.1
+METRICS_TOKEN = os.environ.get("IEEE_METRICS_TOKEN", "")
+
+
+@app.route('/metrics')
+def metrics():
+    if not METRICS_TOKEN:
+        return "Not Found", 404
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode("utf-8"), METRICS_TOKEN.encode("utf-8")):
+        return "Forbidden", 403
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+# ========================
+# 🔬 Profiling (admins only)
+# ========================
+@app.before_request
+def start_profile():
+    if not profiling.is_admin(session.get('user')):
+        return
+    mode = profiling.profile_mode(request.headers.get("X-Profile")) or profiling.PROFILE_ROUTES.get(request.endpoint)
+    if mode in profiling.PROFILE_MODES:
+        g.profile = profiling.Profile(mode, "request", request.endpoint, session['user'])
+        g.profile.start()
+
+
+def finish_profile(status):
+    profile = g.pop("profile", None)
+    if profile is None:
+        return None
+    profile.stop()
+    return profile.save([session.get('temp_id')], {"request": profile.duration}, status)
+
+
+@app.after_request
+def save_profile(response):
+    record = finish_profile(response.status_code)
+    if record:
+        response.headers["X-Profile-Id"] = record["profile_id"]
+    return response
+
+
+@app.teardown_request
+def save_failed_profile(error):
+    # after_request is skipped when the handler raised
+    if "profile" in g:
+        finish_profile(500)
+
+
+@app.route('/admin/profiles')
+def list_profiles():
+    if not profiling.is_admin(session.get('user')):
+        return jsonify({"error": "Forbidden"}), 403
+    records = profiling.list_profiles()
+    for record in records:
+        record["download_url"] = url_for('download_profile', profile_id=record["profile_id"])
+    return jsonify(records)
+
+
+@app.route('/admin/profiles/<profile_id>')
+def download_profile(profile_id):
+    if not profiling.is_admin(session.get('user')):
+        return jsonify({"error": "Forbidden"}), 403
+    path = profiling.profile_file(profile_id)
+    if not path:
+        return jsonify({"error": "Profile not found (a job profile appears once the job finishes)"}), 404
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=os.path.basename(path))
+
+
 # ===========================================
 # 🚀 Run Server
 # ===========================================
@@ -0,0 +1,165 @@
+# batch_convert.py
+#
+# Convert a directory (or glob) of papers to IEEE PDFs without the web app:
+#   python batch_convert.py papers/ -o ieee_output -j 4
+#   python batch_convert.py "backlog/**/*.pdf" --skip-existing
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+from utils.parsers import parse_input_file
+from utils.pdf_parser import share_cpus
+from utils.latex_formatter import generate_pdf_from_data
+
+REPO_ROOT = Path(__file__).resolve().parent
+
+SUPPORTED_TYPES = {'.pdf', '.docx', '.doc'}
+
+DEFAULT_OUTPUT_DIR = "ieee_output"
+
+
+def find_inputs(patterns, recursive=False):
+    """Expand directories, globs and plain paths into supported files, in a stable order"""
+    found = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            candidates = path.rglob("*") if recursive else path.glob("*")
+        else:
+            candidates = (Path(p) for p in glob.glob(pattern, recursive=True))
+        found.extend(p.resolve() for p in candidates if p.is_file() and p.suffix.lower() in SUPPORTED_TYPES)
+
+    # Drop duplicates from overlapping patterns, keep first-seen order
+    return list(dict.fromkeys(found))
+
+
+def output_stems(inputs):
+    """<stem> per input; papers sharing a file name get -2, -3, ... appended"""
+    seen = {}
+    stems = []
+    for path in inputs:
+        count = seen.get(path.stem.lower(), 0) + 1
+        seen[path.stem.lower()] = count
+        stems.append(path.stem if count == 1 else f"{path.stem}-{count}")
+    return stems
+
+
+def convert_one(input_path, output_dir, stem):
+    """Parse one paper and compile it; returns a report row instead of raising"""
+    report = {"file": str(input_path), "status": "failed", "parse_seconds": None, "pdf_seconds": None}
+    json_path = os.path.join(output_dir, f"{stem}.json")
+    pdf_path = os.path.join(output_dir, f"{stem}.pdf")
+
+    try:
+        started = time.perf_counter()
+        parsed_data = parse_input_file(str(input_path))
+        report["parse_seconds"] = round(time.perf_counter() - started, 3)
+        if not parsed_data or "error" in parsed_data:
+            report["error"] = (parsed_data or {}).get("error", "Unknown error")
+            return report
+
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(parsed_data, f, ensure_ascii=False, indent=2)
+        report["json"] = json_path
+
+        started = time.perf_counter()
+        result = generate_pdf_from_data(parsed_data, output_path=pdf_path)
+        report["pdf_seconds"] = round(time.perf_counter() - started, 3)
+        if "error" in result:
+            report["error"] = result["error"]
+            return report
+
+        report["pdf"] = pdf_path
+        report["cached"] = result.get("cached", False)
+        report["status"] = "ok"
+    except Exception as e:
+        report["error"] = str(e)
+    return report
+
+
+def format_seconds(seconds):
+    return "-" if seconds is None else f"{seconds:.2f}s"
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Convert papers to IEEE PDFs without the web app.")
+    arg_parser.add_argument("inputs", nargs="+", help="directories, globs or files (.pdf, .docx, .doc)")
+    arg_parser.add_argument("-o", "--output-dir", default=DEFAULT_OUTPUT_DIR,
+                            help=f"where PDFs, parsed JSON and report.json go (default: {DEFAULT_OUTPUT_DIR})")
+    arg_parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                            help="papers converted at once (default: CPU count)")
+    arg_parser.add_argument("-r", "--recursive", action="store_true", help="descend into subdirectories")
+    arg_parser.add_argument("--skip-existing", action="store_true",
+                            help="skip papers whose PDF is already in the output directory")
+    args = arg_parser.parse_args(argv)
+
+    # Resolve everything before moving to the repo root, where the parsers and
+    # the LaTeX formatter expect static/, latex_cache/ etc. to live
+    inputs = find_inputs(args.inputs, args.recursive)
+    output_dir = os.path.abspath(args.output_dir)
+    os.chdir(REPO_ROOT)
+
+    if not inputs:
+        print("No .pdf, .docx or .doc files matched.")
+        return 1
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = []
+    skipped = 0
+    for input_path, stem in zip(inputs, output_stems(inputs)):
+        if args.skip_existing and os.path.exists(os.path.join(output_dir, f"{stem}.pdf")):
+            skipped += 1
+            continue
+        jobs.append((input_path, stem))
+
+    print(f"Converting {len(jobs)} paper(s) with {args.workers} worker(s)"
+          + (f", {skipped} already done" if skipped else ""))
+
+    reports = []
+    started = time.perf_counter()
+    # Each worker's own extraction and pdf2docx processes use its share of the CPUs
+    workers = max(1, args.workers)
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+        initializer=share_cpus, initargs=(workers,)
+    ) as pool:
+        futures = {pool.submit(convert_one, input_path, output_dir, stem): input_path for input_path, stem in jobs}
+        for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            try:
+                report = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed for memory)
+                report = {"file": str(futures[future]), "status": "failed", "error": str(e),
+                          "parse_seconds": None, "pdf_seconds": None}
+            reports.append(report)
+
+            name = os.path.basename(report["file"])
+            timings = f"parse {format_seconds(report['parse_seconds'])}, pdf {format_seconds(report['pdf_seconds'])}"
+            if report["status"] == "ok":
+                print(f"[{done}/{len(jobs)}] OK     {name} ({timings})")
+            else:
+                print(f"[{done}/{len(jobs)}] FAILED {name} ({timings}): {report['error']}")
+    elapsed = time.perf_counter() - started
+
+    failures = [r for r in reports if r["status"] != "ok"]
+    reports.sort(key=lambda r: r["file"])
+    with open(os.path.join(output_dir, "report.json"), "w", encoding="utf-8") as f:
+        json.dump({"elapsed_seconds": round(elapsed, 3), "skipped": skipped, "files": reports}, f, indent=2)
+
+    print(f"Done in {elapsed:.1f}s: {len(reports) - len(failures)} converted, {len(failures)} failed"
+          + (f", {skipped} skipped" if skipped else ""))
+    for report in failures:
+        print(f"  {report['file']}: {report['error']}")
+    print(f"Report: {os.path.join(output_dir, 'report.json')}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
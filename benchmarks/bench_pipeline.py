@@ -0,0 +1,477 @@
+# benchmarks/bench_pipeline.py
+#
+# Time each pipeline stage on the sample corpus (temp_data/*.json plus the
+# PDF/DOCX/DOC files in benchmarks/corpus/) and compare against stored baselines:
+#   python benchmarks/bench_pipeline.py                   # run and compare
+#   python benchmarks/bench_pipeline.py --update-baseline # record this machine's numbers
+#   python benchmarks/bench_pipeline.py --stages latex_render,llm_ieee --repeat 5
+#
+# Wall time is the best of --repeat runs; peak memory comes from one extra
+# run under tracemalloc (Python allocations only, not C libraries or
+# child processes). Baselines are machine specific: record them on the
+# machine that runs the comparison. A stage is skipped only when an
+# executable or library it needs is missing; any other error fails it.
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "baselines.json")
+
+# Fixed input files; never the app's uploads/, which changes while it runs
+CORPUS_DIR = os.path.join(REPO_ROOT, "benchmarks", "corpus")
+
+# A stage regresses when it is this much slower (or bigger) than its baseline
+DEFAULT_THRESHOLD = 0.25
+
+# Stages faster than this are too noisy to fail on
+MIN_COMPARABLE_SECONDS = 0.05
+
+# Documents from temp_data used by the JSON-driven stages
+DEFAULT_DOCUMENT_LIMIT = 10
+
+# Latency the stub model adds to every answer
+STUB_MODEL_DELAY = 0.02
+
+
+class StageSkipped(Exception):
+    """A stage can't run here (missing input, library or executable)"""
+
+
+# ---- corpus ----
+
+def load_documents(limit):
+    paths = sorted(glob.glob(os.path.join(REPO_ROOT, "temp_data", "*.json")))[:limit]
+    documents = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            documents.append(json.load(f))
+    return documents
+
+
+def sample_files(*extensions):
+    return sorted(
+        path for ext in extensions
+        for path in glob.glob(os.path.join(CORPUS_DIR, f"*{ext}"))
+    )
+
+
+def require(items, what):
+    if not items:
+        raise StageSkipped(f"no {what} in the corpus")
+    return items
+
+
+def require_executable(name):
+    if shutil.which(name) is None:
+        raise StageSkipped(f"{name} is not installed")
+
+
+def require_nlp():
+    """The spaCy model the PDF parser classifies headings with"""
+    from utils.pdf_parser import get_nlp
+
+    try:
+        get_nlp()
+    except OSError as e:
+        raise StageSkipped(f"spaCy model not installed ({e})")
+
+
+# ---- stub model ----
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/generate like Ollama, with canned text after a fixed delay"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(STUB_MODEL_DELAY)
+        text = "A Stub Title For Benchmarking\n" * 4 if "titles" in payload.get("prompt", "") else (
+            "This paragraph was rewritten in IEEE style by the stub model. " * 20
+        )
+        if payload.get("stream"):
+            lines = [json.dumps({"response": word + " ", "done": False}) for word in text.split(" ")]
+            lines.append(json.dumps({"response": "", "done": True}))
+            body = ("\n".join(lines) + "\n").encode("utf-8")
+        else:
+            body = json.dumps({"response": text, "done": True}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def stub_model():
+    """Point the shared Ollama client at a local stub server"""
+    from utils import ollama_client
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllamaHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    previous = ollama_client._client
+    ollama_client._client = ollama_client.OllamaClient(host=f"http://127.0.0.1:{server.server_port}")
+    try:
+        yield
+    finally:
+        ollama_client._client = previous
+        server.shutdown()
+        server.server_close()
+
+
+def clear_heading_cache():
+    """Forget spaCy heading decisions so every repeat classifies headings from scratch"""
+    from utils import pdf_parser
+
+    with pdf_parser._heading_cache_lock:
+        pdf_parser._heading_cache.clear()
+
+
+def running_conversions():
+    """pids of live pdf2docx conversion processes (python -m utils.parsers); Linux only"""
+    pids = []
+    for entry in glob.glob("/proc/[0-9]*"):
+        try:
+            with open(os.path.join(entry, "cmdline"), "rb") as f:
+                args = f.read().split(b"\0")
+            with open(os.path.join(entry, "stat"), "rb") as f:
+                state = f.read().rsplit(b")", 1)[1].split()[0]
+        except (OSError, IndexError):
+            continue
+        if b"utils.parsers" in args and state != b"Z":
+            pids.append(int(os.path.basename(entry)))
+    return pids
+
+
+def wait_for_conversions(timeout=10):
+    """Block until the last run's conversions are gone, so they can't slow the next run"""
+    deadline = time.monotonic() + timeout
+    while running_conversions():
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"pdf2docx conversions still running: {running_conversions()}")
+        time.sleep(0.05)
+
+
+# ---- stages ----
+# Each stage takes the loaded documents and returns a callable that runs it once
+
+def stage_pdf_direct(documents):
+    from utils.pdf_parser import AcademicPDFParser
+
+    pdfs = require(sample_files(".pdf"), "PDFs")
+    require_nlp()
+
+    def run():
+        clear_heading_cache()
+        parser = AcademicPDFParser()
+        for path in pdfs:
+            parser.parse_pdf_direct(path)
+    return run
+
+
+def stage_parse_docx(documents):
+    from utils.word_parser import parse_docx
+
+    docx_files = require(sample_files(".docx"), "DOCX files")
+
+    def run():
+        for path in docx_files:
+            parse_docx(path)
+    return run
+
+
+def stage_parse_input_file(documents):
+    # The full dispatcher on PDFs: direct parsing with pdf2docx converting
+    # alongside in a child process
+    from utils.parsers import parse_input_file
+
+    pdfs = require(sample_files(".pdf"), "PDFs")
+    require_nlp()
+
+    def run():
+        clear_heading_cache()
+        try:
+            for path in pdfs:
+                result = parse_input_file(path)
+                if "error" in result:
+                    raise RuntimeError(f"{os.path.basename(path)}: {result['error']}")
+        finally:
+            wait_for_conversions()
+    return run
+
+
+def stage_parse_doc(documents):
+    # .doc through LibreOffice, then the DOCX parser
+    from utils.parsers import parse_input_file
+
+    doc_files = require(sample_files(".doc"), "DOC files")
+    require_executable("soffice")
+
+    def run():
+        for path in doc_files:
+            result = parse_input_file(path)
+            if "error" in result:
+                raise RuntimeError(f"{os.path.basename(path)}: {result['error']}")
+    return run
+
+
+def stage_latex_render(documents):
+    # latex_escape plus image-marker rendering on every text field, with a cold fragment cache
+    from utils import latex_formatter
+
+    require(documents, "temp_data documents")
+    texts = []
+    for document in documents:
+        texts.extend([document.get("title", ""), document.get("abstract", ""), document.get("keywords", "")])
+        for section in document.get("sections", []):
+            texts.extend([section.get("heading", ""), section.get("content", "")])
+            for sub in section.get("subsections", []):
+                texts.extend([sub.get("heading", ""), sub.get("content", "")])
+        texts.extend(document.get("references", []))
+
+    def run():
+        latex_formatter._fragment_cache.clear()
+        latex_formatter._image_check_cache.clear()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for text in texts:
+                latex_formatter.latex_escape(text)
+                latex_formatter.render_images(text, None, tmpdir)
+    return run
+
+
+def stage_generate_pdf(documents):
+    from utils import latex_formatter
+
+    require(documents, "temp_data documents")
+    require_executable("pdflatex")
+    sample = documents[:3]
+
+    def run():
+        # Always a real compile; the cache would otherwise answer instantly
+        for document in sample:
+            result = latex_formatter.generate_pdf_from_data(document, use_cache=False)
+            if "error" in result:
+                raise RuntimeError(result["error"].splitlines()[0])
+    return run
+
+
+def stage_llm_ieee(documents):
+    from utils.llm_formatter import generate_ieee_markdown
+
+    require(documents, "temp_data documents")
+
+    def run():
+        with stub_model():
+            for document in documents:
+                result = generate_ieee_markdown(document, refresh=True)
+                if "error" in result:
+                    raise RuntimeError(result["error"])
+    return run
+
+
+def stage_llm_titles(documents):
+    from utils.title_suggested import suggest_titles
+
+    require(documents, "temp_data documents")
+
+    def run():
+        with stub_model():
+            for document in documents:
+                suggest_titles(document, refresh=True)
+    return run
+
+
+STAGES = {
+    "pdf_direct": stage_pdf_direct,
+    "parse_docx": stage_parse_docx,
+    "parse_input_file": stage_parse_input_file,
+    "parse_doc": stage_parse_doc,
+    "latex_render": stage_latex_render,
+    "generate_pdf": stage_generate_pdf,
+    "llm_ieee": stage_llm_ieee,
+    "llm_titles": stage_llm_titles,
+}
+
+
+# ---- measuring ----
+
+@contextlib.contextmanager
+def quiet(verbose):
+    if verbose:
+        yield
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+
+
+def measure(run, repeat, verbose):
+    """Best wall time over repeat runs, then peak traced memory of one more run"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with quiet(verbose):
+            run()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        with quiet(verbose):
+            run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": round(min(timings), 4),
+        "mean_seconds": round(sum(timings) / len(timings), 4),
+        "peak_mb": round(peak / (1024 * 1024), 2),
+    }
+
+
+# Cache directories redirected to a scratch directory during a run
+CACHE_SETTINGS = [
+    ("utils.latex_formatter", "PDF_CACHE_DIR"),
+    ("utils.latex_formatter", "CONVERTED_IMAGE_DIR"),
+    ("utils.llm_cache", "LLM_CACHE_DIR"),
+    ("utils.image_store", "IMAGE_STORE_DIR"),
+]
+
+
+@contextlib.contextmanager
+def isolated_caches():
+    """Keep the run from reading or filling the real PDF, LLM and image caches"""
+    import importlib
+
+    saved = []
+    with tempfile.TemporaryDirectory() as scratch:
+        for module_name, attribute in CACHE_SETTINGS:
+            try:
+                module = importlib.import_module(module_name)
+            except ImportError:
+                continue  # the stages needing it will be skipped
+            saved.append((module, attribute, getattr(module, attribute)))
+            setattr(module, attribute, os.path.join(scratch, attribute.lower()))
+        try:
+            yield
+        finally:
+            for module, attribute, value in saved:
+                setattr(module, attribute, value)
+
+
+def compare(stage, result, baseline, threshold):
+    """Return a list of regression messages for one stage"""
+    if not baseline:
+        return []
+    problems = []
+    if baseline.get("seconds", 0) >= MIN_COMPARABLE_SECONDS:
+        limit = baseline["seconds"] * (1 + threshold)
+        if result["seconds"] > limit:
+            problems.append(f"{stage}: {result['seconds']:.3f}s vs baseline {baseline['seconds']:.3f}s")
+    if baseline.get("peak_mb"):
+        limit = baseline["peak_mb"] * (1 + threshold)
+        if result["peak_mb"] > limit and result["peak_mb"] - baseline["peak_mb"] > 1:
+            problems.append(f"{stage}: {result['peak_mb']:.1f}MB peak vs baseline {baseline['peak_mb']:.1f}MB")
+    return problems
+
+
+def machine_info():
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark the conversion pipeline stage by stage.")
+    arg_parser.add_argument("--stages", default=",".join(STAGES),
+                            help=f"comma separated subset of: {', '.join(STAGES)}")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage (best is kept)")
+    arg_parser.add_argument("--documents", type=int, default=DEFAULT_DOCUMENT_LIMIT,
+                            help="temp_data documents used by the JSON-driven stages")
+    arg_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="allowed slowdown/growth before a stage fails (0.25 = 25%%)")
+    arg_parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file")
+    arg_parser.add_argument("--update-baseline", action="store_true",
+                            help="store this run's numbers as the baseline instead of comparing")
+    arg_parser.add_argument("--output", help="also write this run's results to a JSON file")
+    arg_parser.add_argument("-v", "--verbose", action="store_true", help="show the pipeline's own output")
+    args = arg_parser.parse_args(argv)
+
+    selected = [name.strip() for name in args.stages.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in STAGES]
+    if unknown:
+        arg_parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    # Paths in the pipeline (static/, latex_cache/, ...) are relative to the repo root
+    os.chdir(REPO_ROOT)
+    documents = load_documents(args.documents)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baselines = json.load(f).get("stages", {})
+
+    results = {}
+    regressions = []
+    with isolated_caches():
+        for name in selected:
+            try:
+                run = STAGES[name](documents)
+                result = measure(run, max(1, args.repeat), args.verbose)
+            except (StageSkipped, ImportError) as e:
+                print(f"{name:>17}: skipped ({e})")
+                continue
+            except Exception as e:
+                print(f"{name:>17}: FAILED ({type(e).__name__}: {e})")
+                regressions.append(f"{name}: failed")
+                continue
+
+            results[name] = result
+            baseline = baselines.get(name)
+            reference = f" (baseline {baseline['seconds']:.3f}s, {baseline['peak_mb']:.1f}MB)" if baseline else ""
+            print(f"{name:>17}: {result['seconds']:.3f}s best, {result['mean_seconds']:.3f}s mean, "
+                  f"{result['peak_mb']:.1f}MB peak{reference}")
+            if not args.update_baseline:
+                regressions.extend(compare(name, result, baseline, args.threshold))
+
+    report = {"machine": machine_info(), "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "stages": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        # Stages that were skipped this time keep their previous baseline
+        report["stages"] = dict(baselines, **results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"\nRegressions beyond {args.threshold:.0%}:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    if not baselines:
+        print("\nNo baseline yet; run with --update-baseline to record one.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
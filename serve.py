@@ -0,0 +1,26 @@
+# serve.py
+#
+# Production-style server: one process, gevent greenlets per request.
+#   python serve.py            (HOST / PORT env vars, default 127.0.0.1:5000)
+# Development still works with `python app.py`.
+#
+# Everything happens under the __main__ guard: spawned parser processes
+# re-import this file and must neither patch nor start a server.
+
+import os
+
+HOST = os.environ.get("HOST", "127.0.0.1")
+PORT = int(os.environ.get("PORT", "5000"))
+
+
+if __name__ == "__main__":
+    from utils.serving import patch_for_gevent
+
+    patch_for_gevent()
+
+    from gevent.pywsgi import WSGIServer
+
+    from app import app
+
+    print(f"[SERVER] Serving on http://{HOST}:{PORT} (gevent)")
+    WSGIServer((HOST, PORT), app).serve_forever()
@@ -0,0 +1,62 @@
+# setup_db.py
+#
+# One-off MongoDB preparation, run after deploying and before starting the app:
+#   python setup_db.py
+# Creates the indexes the app relies on and moves uploads that are still
+# embedded in users.uploads into the uploads collection. Safe to re-run.
+
+import os
+import sys
+
+from dateutil import parser
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+# Same database as app.py
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+DATABASE = "authdb"
+
+
+def migrate_embedded_uploads(db):
+    """Move users.uploads arrays into the uploads collection; safe to run repeatedly"""
+    users_collection, uploads_collection = db["users"], db["uploads"]
+    moved = 0
+    for user in users_collection.find({"uploads": {"$exists": True}}, {"email": 1, "uploads": 1}):
+        operations = []
+        for entry in user.get("uploads") or []:
+            if not entry.get("temp_id"):
+                continue
+            entry = dict(entry, owner=user["email"])
+            if isinstance(entry.get("parsed_on"), str):
+                try:
+                    entry["parsed_on"] = parser.parse(entry["parsed_on"])
+                except (ValueError, OverflowError):
+                    pass
+            operations.append(UpdateOne({"temp_id": entry["temp_id"]}, {"$setOnInsert": entry}, upsert=True))
+        if operations:
+            moved += uploads_collection.bulk_write(operations, ordered=False).upserted_count
+        users_collection.update_one({"_id": user["_id"]}, {"$unset": {"uploads": ""}})
+    print(f"[DB] Moved {moved} upload(s) into the uploads collection")
+    return moved
+
+
+def prepare_database(db):
+    """Create indexes and migrate old data; returns False if something failed"""
+    try:
+        db["uploads"].create_index([("owner", 1), ("parsed_on", -1)])
+        db["uploads"].create_index("temp_id", unique=True)
+        migrate_embedded_uploads(db)
+        db["users"].create_index("email", unique=True)
+    except DuplicateKeyError as e:
+        print(f"[WARN] Duplicate user emails, unique index not created: {e}")
+        return False
+    except PyMongoError as e:
+        print(f"[ERROR] Could not prepare MongoDB: {e}")
+        return False
+    print("[DB] Indexes ready")
+    return True
+
+
+if __name__ == "__main__":
+    client = MongoClient(MONGO_URI)
+    sys.exit(0 if prepare_database(client[DATABASE]) else 1)
@@ -1,18 +1,10 @@
-import subprocess
+from utils.ollama_client import get_client
 
 prompt = "Suggest 3 research paper titles on energy-efficient AI."
 
 try:
-    result = subprocess.run(
-        ["ollama", "run", "phi3:mini"],
-        input=prompt,
-        text=True,
-        capture_output=True,
-        timeout=60
-    )
-    print("STDOUT:")
-    print(result.stdout)
-    print("STDERR:")
-    print(result.stderr)
+    output = get_client().generate("phi3:mini", prompt, timeout=60)
+    print("OUTPUT:")
+    print(output)
 except Exception as e:
     print("Error:", e)
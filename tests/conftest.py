@@ -0,0 +1,89 @@
+# tests/conftest.py
+
+import os
+import sys
+import threading
+import uuid
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+class FakeUploads:
+    """The few uploads_collection calls the routes make, over a list of records"""
+
+    def __init__(self, records=()):
+        self.records = list(records)
+
+    def _matches(self, record, query):
+        return all(record.get(key) == value for key, value in query.items())
+
+    def find_one(self, query, projection=None):
+        return next((dict(record) for record in self.records if self._matches(record, query)), None)
+
+    def insert_one(self, record):
+        self.records.append(dict(record))
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """app.py imported from a scratch directory (it creates its folders relative to it)"""
+    pytest.importorskip("flask")
+    pytest.importorskip("pymongo")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(tmp_path_factory.mktemp("app"))
+        import app
+    return app
+
+
+@pytest.fixture
+def app_client(app_module, tmp_path, monkeypatch):
+    """
+    Test client with a fresh document store and FakeUploads in place of
+    MongoDB. open_document(parsed, owner) stores a paper, records the
+    upload and signs the client in as owner; it returns the temp_id.
+    """
+    from utils import doc_store
+
+    store = doc_store.DocumentStore(str(tmp_path / "documents.db"))
+    uploads = FakeUploads()
+    monkeypatch.setattr(app_module, "doc_store", store)
+    monkeypatch.setattr(app_module, "uploads_collection", uploads)
+    client = app_module.app.test_client()
+
+    def open_document(parsed_data, owner="author@example.com"):
+        temp_id = str(uuid.uuid4())
+        store.create(temp_id, parsed_data)
+        uploads.insert_one({"owner": owner, "temp_id": temp_id})
+        with client.session_transaction() as session:
+            session["user"] = owner
+        return temp_id
+
+    client.store = store
+    client.uploads = uploads
+    client.open_document = open_document
+    return client
+
+
+@pytest.fixture
+def stub_server():
+    """
+    Start local HTTP servers for handler classes (e.g. a stub Ollama);
+    stub_server(handler_class) returns the base URL. Stopped after the test.
+    """
+    servers = []
+
+    def start(handler_class):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,89 @@
+# tests/mongo_stub.py
+#
+# Just enough of the MongoDB wire protocol for pymongo to connect and run
+# the app's queries against empty collections: hello over OP_QUERY or
+# OP_MSG, find/aggregate answering no documents, writes acknowledged.
+# HANDSHAKE_DELAY slows every new connection's hello, so concurrent
+# requests pile up behind pymongo's maxConnecting limit.
+
+import socketserver
+import struct
+import threading
+import time
+
+import bson
+
+OP_REPLY = 1
+OP_QUERY = 2004
+OP_MSG = 2013
+
+HELLO = {
+    "ok": 1.0, "isWritablePrimary": True, "ismaster": True, "helloOk": True,
+    "maxWireVersion": 21, "minWireVersion": 0, "maxBsonObjectSize": 16 * 1024 * 1024,
+    "maxMessageSizeBytes": 48000000, "maxWriteBatchSize": 100000, "logicalSessionTimeoutMinutes": 30,
+}
+
+
+def answer(command):
+    name = next(iter(command))
+    if name.lower() in ("hello", "ismaster"):
+        return dict(HELLO, localTime=bson.datetime.datetime.now(bson.tz_util.utc))
+    if name in ("find", "aggregate"):
+        collection = command[name] if isinstance(command[name], str) else "x"
+        return {"ok": 1.0, "cursor": {"id": bson.int64.Int64(0), "ns": f"{command.get('$db', 'db')}.{collection}",
+                                      "firstBatch": []}}
+    if name in ("insert", "delete", "update"):
+        return {"ok": 1.0, "n": 1}
+    return {"ok": 1.0}
+
+
+class MongoStubHandler(socketserver.BaseRequestHandler):
+    handshake_delay = 0.0
+
+    def read_exactly(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("closed")
+            data += chunk
+        return data
+
+    def handle(self):
+        first = True
+        try:
+            while True:
+                length, request_id, _, op_code = struct.unpack("<iiii", self.read_exactly(16))
+                body = self.read_exactly(length - 16)
+                if op_code == OP_QUERY:
+                    # flags, "db.$cmd\0", skip, limit, then the command document
+                    end = body.index(b"\0", 4)
+                    command = bson.decode(body[end + 9:])
+                else:
+                    # flags, then a kind 0 section holding the command (any
+                    # document sequences after it, e.g. inserted documents, are ignored)
+                    size = struct.unpack("<i", body[5:9])[0]
+                    command = bson.decode(body[5:5 + size])
+                if first:
+                    first = False
+                    time.sleep(self.handshake_delay)
+
+                reply = bson.encode(answer(command))
+                if op_code == OP_QUERY:
+                    payload = struct.pack("<iqii", 0, 0, 0, 1) + reply
+                    reply_code = OP_REPLY
+                else:
+                    payload = struct.pack("<I", 0) + b"\0" + reply
+                    reply_code = OP_MSG
+                self.request.sendall(struct.pack("<iiii", 16 + len(payload), 0, request_id, reply_code) + payload)
+        except (ConnectionError, OSError):
+            pass
+
+
+def start_mongo_stub(handshake_delay=0.0):
+    """Serve the stub on a free local port in a background thread; returns the server"""
+    handler = type("Handler", (MongoStubHandler,), {"handshake_delay": handshake_delay})
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,115 @@
+# tests/test_doc_store.py
+#
+# Optimistic concurrency in the document store: deltas bump the revision,
+# stale revisions conflict, section_count truncates and extends, and full
+# saves only rewrite what changed.
+
+import threading
+
+import pytest
+
+from utils.doc_store import DocumentStore, RevisionConflict
+
+
+def section(n):
+    return {"heading": f"Section {n}", "content": f"Text of section {n}.", "subsections": []}
+
+
+PAPER = {"title": "A Paper", "abstract": "An abstract.", "sections": [section(0), section(1), section(2)]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DocumentStore(str(tmp_path / "documents.db"))
+    store.create("doc", PAPER)
+    return store
+
+
+def test_apply_changes_merges_meta_and_replaces_sections(store):
+    revision = store.apply_changes("doc", 1, meta={"title": "New Title"}, sections={"1": section(9)})
+
+    data, stored_revision = store.load("doc")
+    assert revision == stored_revision == 2
+    assert data["title"] == "New Title"
+    assert data["abstract"] == "An abstract."
+    assert data["sections"] == [section(0), section(9), section(2)]
+
+
+def test_stale_revision_conflicts_and_changes_nothing(store):
+    store.apply_changes("doc", 1, meta={"title": "First"})
+
+    with pytest.raises(RevisionConflict) as conflict:
+        store.apply_changes("doc", 1, meta={"title": "Second"})
+
+    assert conflict.value.current_revision == 2
+    data, revision = store.load("doc")
+    assert (data["title"], revision) == ("First", 2)
+
+
+def test_concurrent_deltas_from_one_revision_let_exactly_one_win(store):
+    outcomes = []
+
+    def save(title):
+        try:
+            outcomes.append(store.apply_changes("doc", 1, meta={"title": title}))
+        except RevisionConflict:
+            outcomes.append("conflict")
+
+    threads = [threading.Thread(target=save, args=(f"Title {n}",)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes, key=str) == [2] + ["conflict"] * 7
+    assert store.load("doc")[1] == 2
+
+
+def test_section_count_truncates(store):
+    store.apply_changes("doc", 1, section_count=1)
+
+    assert store.load("doc")[0]["sections"] == [section(0)]
+
+
+def test_section_count_extends_with_new_sections_sent_in_full(store):
+    store.apply_changes("doc", 1, sections={"3": section(3), "4": section(4)}, section_count=5)
+
+    assert store.load("doc")[0]["sections"] == [section(n) for n in range(5)]
+
+
+@pytest.mark.parametrize("changes", [
+    {"section_count": 5, "sections": {"3": section(3)}},   # section 4 missing
+    {"sections": {"3": section(3)}},                        # beyond the stored count
+    {"section_count": -1},
+])
+def test_invalid_section_changes_are_rejected(store, changes):
+    with pytest.raises(ValueError):
+        store.apply_changes("doc", 1, **changes)
+    assert store.load("doc") == (PAPER, 1)
+
+
+def test_missing_document_is_a_key_error(store):
+    with pytest.raises(KeyError):
+        store.apply_changes("missing", 1, meta={"title": "x"})
+
+
+def test_save_rewrites_only_changed_sections(store):
+    edited = dict(PAPER, sections=[section(0), section(7)])
+
+    revision = store.save("doc", edited)
+
+    assert revision == 2
+    assert store.load("doc")[0] == edited
+    assert store.revisions("doc")[0]["changes"] == {"meta": [], "sections": [1], "removed": [2]}
+
+
+def test_save_of_an_unchanged_document_keeps_its_revision(store):
+    assert store.save("doc", PAPER) == 1
+    assert len(store.revisions("doc")) == 1
+
+
+def test_save_checks_the_expected_revision(store):
+    store.apply_changes("doc", 1, meta={"title": "Elsewhere"})
+
+    with pytest.raises(RevisionConflict):
+        store.save("doc", PAPER, expected_revision=1)
@@ -0,0 +1,77 @@
+# tests/test_document_routes.py
+#
+# PATCH /document and the preview name their document explicitly: saves
+# check ownership and the revision, and each tab previews its own paper
+# whatever the session last opened.
+
+import pytest
+
+PAPER = {
+    "title": "Paper X",
+    "abstract": "About X.",
+    "sections": [{"heading": "Intro", "content": "X.", "subsections": []}],
+}
+
+
+def patch(client, temp_id, revision, **changes):
+    return client.patch("/document", json={"temp_id": temp_id, "revision": revision, **changes})
+
+
+def test_patch_saves_and_returns_the_new_revision(app_client):
+    temp_id = app_client.open_document(PAPER)
+
+    response = patch(app_client, temp_id, 1, meta={"title": "Paper X, revised"})
+
+    assert response.status_code == 200
+    assert response.get_json() == {"revision": 2}
+    assert app_client.store.load(temp_id)[0]["title"] == "Paper X, revised"
+
+
+def test_patch_with_a_stale_revision_is_a_conflict(app_client):
+    temp_id = app_client.open_document(PAPER)
+    patch(app_client, temp_id, 1, meta={"title": "From tab A"})
+
+    response = patch(app_client, temp_id, 1, meta={"title": "From tab B"})
+
+    assert response.status_code == 409
+    assert response.get_json()["revision"] == 2
+    assert app_client.store.load(temp_id)[0]["title"] == "From tab A"
+
+
+def test_patch_of_another_users_document_is_not_found(app_client):
+    theirs = app_client.open_document(PAPER, owner="other@example.com")
+    app_client.open_document(PAPER)
+
+    response = patch(app_client, theirs, 1, meta={"title": "Hijacked"})
+
+    assert response.status_code == 404
+    assert app_client.store.load(theirs) == (PAPER, 1)
+
+
+@pytest.mark.parametrize("body", [{"revision": 1}, {"temp_id": "x"}, None])
+def test_patch_without_document_or_revision_is_rejected(app_client, body):
+    app_client.open_document(PAPER)
+
+    response = app_client.patch("/document", json=body)
+
+    assert response.status_code == 400
+
+
+def test_preview_compiles_the_named_document_not_the_sessions(app_client, app_module, monkeypatch):
+    compiled = []
+
+    def fake_compile(data):
+        compiled.append(data["title"])
+        return {"success": True, "pdf_url": "/static/pdf_cache/x.pdf"}
+
+    monkeypatch.setattr(app_module, "generate_pdf_from_data", fake_compile)
+    tab_a = app_client.open_document(PAPER)
+    tab_b = app_client.open_document(dict(PAPER, title="Paper Y"))
+    with app_client.session_transaction() as session:
+        session["temp_id"] = tab_b   # tab B opened last
+
+    response = app_client.post("/generate_pdf", json={"temp_id": tab_a})
+
+    assert response.status_code == 200
+    assert response.get_json()["revision"] == 1
+    assert compiled == ["Paper X"]
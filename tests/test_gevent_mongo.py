@@ -0,0 +1,71 @@
+# tests/test_gevent_mongo.py
+#
+# Under gevent, many greenlets hitting MongoDB at once must not freeze the
+# server. pymongo lets only two connections handshake at a time and makes
+# the rest wait on a native threading.Condition; the app runs in its own
+# process against a slow-handshaking stub so a frozen hub shows up as a
+# timeout instead of hanging the test run.
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import REPO_ROOT
+from mongo_stub import start_mongo_stub
+
+CONCURRENT_REQUESTS = 8
+
+SERVER_SCRIPT = """
+from utils.serving import patch_for_gevent
+
+patch_for_gevent()
+
+import json
+import sys
+
+import gevent
+from app import app
+
+
+def visit(path):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user"] = "author@example.com"
+    return client.get(path).status_code
+
+
+paths = ["/dashboard", "/resume/missing", "/delete_upload/missing", "/dashboard?page=2"]
+visits = [gevent.spawn(visit, paths[n % len(paths)]) for n in range(int(sys.argv[1]))]
+gevent.joinall(visits, raise_error=True)
+print(json.dumps([visit.value for visit in visits]))
+"""
+
+
+def test_concurrent_mongo_requests_do_not_freeze_the_hub(tmp_path):
+    pytest.importorskip("gevent")
+    pytest.importorskip("flask")
+    pytest.importorskip("pymongo")
+    stub = start_mongo_stub(handshake_delay=0.3)
+    env = dict(
+        os.environ,
+        MONGO_URI=f"mongodb://127.0.0.1:{stub.server_address[1]}/?serverSelectionTimeoutMS=5000",
+        PYTHONPATH=REPO_ROOT,
+    )
+    try:
+        finished = subprocess.run(
+            [sys.executable, "-c", SERVER_SCRIPT, str(CONCURRENT_REQUESTS)],
+            cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60,
+        )
+    except subprocess.TimeoutExpired:
+        pytest.fail("the gevent hub froze with concurrent requests waiting on MongoDB")
+    finally:
+        stub.shutdown()
+        stub.server_close()
+
+    assert finished.returncode == 0, finished.stderr
+    statuses = json.loads(finished.stdout.strip().splitlines()[-1])
+    assert len(statuses) == CONCURRENT_REQUESTS
+    assert all(status in (200, 302) for status in statuses)
@@ -0,0 +1,133 @@
+# tests/test_ieee_stream.py
+#
+# /generate_ieee/stream against a stub Ollama server: tokens arrive as
+# Server-Sent Events, the stream ends with a done event, and a client that
+# goes away mid-stream closes the connection to the model.
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+STUB_TOKENS = ["Rewritten ", "in ", "IEEE ", "style."]
+
+PAPER = {
+    "title": "A Stub Paper",
+    "abstract": "We test streaming.",
+    "keywords": "streaming, testing",
+    "sections": [{"heading": "Introduction", "content": "Short enough for one prompt.", "subsections": []}],
+    "references": ["A. Author, \"A Reference,\" 2024."],
+}
+
+
+class StreamingOllamaHandler(BaseHTTPRequestHandler):
+    """
+    Streams /api/generate answers as chunked NDJSON like Ollama. With
+    endless set it keeps streaming until the client hangs up, then sets
+    disconnected.
+    """
+
+    protocol_version = "HTTP/1.1"
+    endless = False
+    disconnected = None
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            while self.endless:
+                self.write_line({"response": "more ", "done": False})
+                time.sleep(0.01)
+            for token in STUB_TOKENS:
+                self.write_line({"response": token, "done": False})
+            self.write_line({"response": "", "done": True})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.disconnected.set()
+
+    def write_line(self, payload):
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stream_client(app_client, stub_server, tmp_path, monkeypatch):
+    """Start the stub model with a handler; returns (test client, temp_id of PAPER)"""
+    from utils import llm_cache, ollama_client
+
+    def start(handler_class):
+        host = stub_server(handler_class)
+        monkeypatch.setattr(ollama_client, "_client", ollama_client.OllamaClient(host=host, retries=0))
+        monkeypatch.setattr(llm_cache, "LLM_CACHE_DIR", str(tmp_path / "llm_cache"))
+        return app_client, app_client.open_document(PAPER)
+
+    return start
+
+
+def parse_events(text):
+    """(event, data) pairs from a Server-Sent Events body"""
+    events = []
+    for block in text.split("\n\n"):
+        if not block.strip():
+            continue
+        event, data = "message", None
+        for line in block.splitlines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        events.append((event, data))
+    return events
+
+
+def test_stream_sends_tokens_then_done(stream_client):
+    client, temp_id = stream_client(StreamingOllamaHandler)
+
+    response = client.get(f"/generate_ieee/stream?temp_id={temp_id}&refresh=1")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = parse_events(response.get_data(as_text=True))
+    tokens = [data["token"] for event, data in events if event == "message"]
+    assert tokens[:len(STUB_TOKENS)] == STUB_TOKENS
+    assert "A Reference" in "".join(tokens[len(STUB_TOKENS):])
+    assert events[-1] == ("done", {})
+    assert not any(event == "failed" for event, _ in events)
+
+
+def test_closing_the_stream_closes_the_model_connection(stream_client):
+    disconnected = threading.Event()
+    handler = type("EndlessHandler", (StreamingOllamaHandler,), {"endless": True, "disconnected": disconnected})
+    client, temp_id = stream_client(handler)
+
+    response = client.get(f"/generate_ieee/stream?temp_id={temp_id}&refresh=1", buffered=False)
+    body = iter(response.response)
+    first = next(body)
+    if isinstance(first, bytes):
+        first = first.decode("utf-8")
+    assert first.startswith("data: ")
+    assert json.loads(first[len("data: "):])["token"] == "more "
+
+    response.close()
+
+    assert disconnected.wait(5), "the upstream connection was still open after the client went away"
+
+
+def test_stream_of_another_users_document_is_refused(stream_client):
+    client, _ = stream_client(StreamingOllamaHandler)
+    someone_else = client.open_document(PAPER, owner="other@example.com")
+    with client.session_transaction() as session:
+        session["user"] = "author@example.com"
+
+    response = client.get(f"/generate_ieee/stream?temp_id={someone_else}")
+
+    assert response.status_code == 404
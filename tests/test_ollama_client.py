@@ -0,0 +1,204 @@
+# tests/test_ollama_client.py
+#
+# OllamaClient against stub servers: stale keep-alive connections and 5xx
+# answers are retried, timeouts become OllamaTimeout without a retry, and
+# the per-model semaphore caps requests in flight. Every request names the
+# model's context size.
+
+import collections
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from utils.ollama_client import OllamaClient, OllamaError, OllamaTimeout, context_tokens
+
+
+class StubState:
+    """Counters and in-flight tracking shared by a stub's handler threads"""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.in_flight = collections.Counter()
+        self.peak = collections.Counter()
+        self.payloads = []
+        self.lock = threading.Lock()
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+            return self.counts[name]
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/generate like Ollama; subclasses override answer() to misbehave"""
+
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def setup(self):
+        super().setup()
+        self.state.count("connections")
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.answer(payload, self.state.count("requests"))
+
+    def answer(self, payload, number):
+        self.send_json(200, {"response": f"answer {number}", "done": True})
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_client(stub_server):
+    """stub_client(handler_class, **client_options) -> (OllamaClient, StubState)"""
+
+    def start(handler_class, **options):
+        state = StubState()
+        host = stub_server(type(handler_class.__name__, (handler_class,), {"state": state}))
+        return OllamaClient(host=host, **options), state
+
+    return start
+
+
+class RecordsPayloads(StubOllamaHandler):
+    def answer(self, payload, number):
+        with self.state.lock:
+            self.state.payloads.append(payload)
+        super().answer(payload, number)
+
+
+class ClosesIdleConnections(StubOllamaHandler):
+    """Keeps the connection open per HTTP/1.1, then drops it like an idle timeout would"""
+
+    def answer(self, payload, number):
+        super().answer(payload, number)
+        self.close_connection = True
+
+
+class FailsFirst(StubOllamaHandler):
+    failures = 1
+
+    def answer(self, payload, number):
+        if number <= self.failures:
+            self.send_json(503, {"error": "model is loading"})
+        else:
+            super().answer(payload, number)
+
+
+class AlwaysFails(FailsFirst):
+    failures = float("inf")
+
+
+class Slow(StubOllamaHandler):
+    def answer(self, payload, number):
+        time.sleep(1)
+        super().answer(payload, number)
+
+
+class StallsMidStream(StubOllamaHandler):
+    def answer(self, payload, number):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        self.wfile.write(json.dumps({"response": "first ", "done": False}).encode("utf-8") + b"\n")
+        self.wfile.flush()
+        time.sleep(1)
+        self.close_connection = True
+
+
+class TracksConcurrency(StubOllamaHandler):
+    def answer(self, payload, number):
+        model = payload["model"]
+        with self.state.lock:
+            self.state.in_flight[model] += 1
+            self.state.peak[model] = max(self.state.peak[model], self.state.in_flight[model])
+        time.sleep(0.1)
+        with self.state.lock:
+            self.state.in_flight[model] -= 1
+        super().answer(payload, number)
+
+
+def test_requests_carry_the_model_context_size(stub_client):
+    client, state = stub_client(RecordsPayloads)
+
+    client.generate("llama3", "prompt", {"temperature": 0.3})
+    client.load("phi3:mini")
+
+    generate, load = state.payloads
+    assert generate["options"] == {"num_ctx": context_tokens("llama3"), "temperature": 0.3}
+    assert load["options"] == {"num_ctx": context_tokens("phi3:mini")}
+
+
+def test_stale_keep_alive_connection_is_retried(stub_client):
+    client, state = stub_client(ClosesIdleConnections, retries=1)
+
+    assert client.generate("llama3", "one") == "answer 1"
+    time.sleep(0.1)  # let the server's close reach the pooled connection
+    assert client.generate("llama3", "two") == "answer 2"
+
+    assert state.counts["requests"] == 2
+    assert state.counts["connections"] == 2
+
+
+def test_5xx_is_retried_until_success(stub_client):
+    client, state = stub_client(FailsFirst, retries=2)
+
+    assert client.generate("llama3", "prompt") == "answer 2"
+    assert state.counts["requests"] == 2
+
+
+def test_5xx_after_last_retry_is_an_error(stub_client):
+    client, state = stub_client(AlwaysFails, retries=1)
+
+    with pytest.raises(OllamaError, match="HTTP 503: model is loading"):
+        client.generate("llama3", "prompt")
+    assert state.counts["requests"] == 2
+
+
+def test_timeout_maps_to_ollama_timeout_without_retry(stub_client):
+    client, state = stub_client(Slow, retries=2, timeout=0.2)
+
+    with pytest.raises(OllamaTimeout):
+        client.generate("llama3", "prompt")
+    assert state.counts["requests"] == 1
+
+
+def test_stalled_stream_maps_to_ollama_timeout(stub_client):
+    client, _ = stub_client(StallsMidStream, timeout=0.2)
+
+    tokens = client.stream("llama3", "prompt")
+    assert next(tokens) == "first "
+    with pytest.raises(OllamaTimeout):
+        next(tokens)
+
+
+def test_semaphore_caps_requests_in_flight_per_model(stub_client):
+    client, state = stub_client(TracksConcurrency, max_concurrency=2)
+    results = []
+
+    def call(model):
+        results.append(client.generate(model, "prompt"))
+
+    threads = [threading.Thread(target=call, args=(model,)) for model in ["llama3"] * 6 + ["phi3:mini"] * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 8
+    assert state.peak["llama3"] == 2
+    assert state.peak["phi3:mini"] == 2
@@ -0,0 +1,52 @@
+# utils/disk_cache.py
+
+import os
+import threading
+
+# Serialises eviction so two writers don't race over the same files
+_eviction_lock = threading.Lock()
+
+
+def touch(path):
+    """Mark a cache entry as recently used (LRU order follows mtime)"""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def enforce_size_limit(directory, max_bytes, suffix=None):
+    """Delete least recently used files until the directory fits in max_bytes"""
+    with _eviction_lock:
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return 0
+
+        for name in names:
+            if suffix and not name.endswith(suffix):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if not os.path.isfile(path):
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
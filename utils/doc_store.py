@@ -0,0 +1,317 @@
+# utils/doc_store.py
+
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# SQLite database holding every parsed document
+DOC_STORE_PATH = os.environ.get("DOC_STORE_PATH", os.path.join("data", "documents.db"))
+
+# Revision log entries kept per document
+REVISION_HISTORY = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    temp_id    TEXT PRIMARY KEY,
+    meta       TEXT NOT NULL,
+    revision   INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sections (
+    temp_id  TEXT NOT NULL REFERENCES documents(temp_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    body     TEXT NOT NULL,
+    PRIMARY KEY (temp_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS revisions (
+    temp_id  TEXT NOT NULL REFERENCES documents(temp_id) ON DELETE CASCADE,
+    revision INTEGER NOT NULL,
+    saved_at REAL NOT NULL,
+    changes  TEXT NOT NULL,
+    PRIMARY KEY (temp_id, revision)
+) WITHOUT ROWID;
+"""
+
+
+class RevisionConflict(Exception):
+    """The document changed since the revision the caller started from"""
+
+    def __init__(self, current_revision):
+        super().__init__(f"Document is at revision {current_revision}")
+        self.current_revision = current_revision
+
+
+def encode(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def split_document(parsed_data):
+    """(meta, sections): everything but the sections goes into one compact meta row"""
+    meta = {key: value for key, value in parsed_data.items() if key != "sections"}
+    return meta, parsed_data.get("sections", [])
+
+
+class DocumentStore:
+    """
+    Parsed documents in SQLite: one row per document for its metadata and
+    one row per section, so a save only rewrites the sections that changed.
+    Every save runs in a single transaction and bumps the document revision.
+    """
+
+    def __init__(self, path=DOC_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        # One connection per thread; WAL lets readers and the writer overlap
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    class _Transaction:
+        def __init__(self, conn):
+            self.conn = conn
+
+        def __enter__(self):
+            # IMMEDIATE takes the write lock up front, so read-check-write is atomic
+            self.conn.execute("BEGIN IMMEDIATE")
+            return self.conn
+
+        def __exit__(self, exc_type, exc, tb):
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+            return False
+
+    def _transaction(self):
+        return self._Transaction(self._connection())
+
+    # ---- reads ----
+
+    def load(self, temp_id):
+        """Return (parsed_data, revision), or (None, None) if the document doesn't exist"""
+        conn = self._connection()
+        # One read transaction, so the sections match the revision returned
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT meta, revision FROM documents WHERE temp_id = ?", (temp_id,)).fetchone()
+            if row is None:
+                return None, None
+            bodies = [
+                body for (body,) in conn.execute(
+                    "SELECT body FROM sections WHERE temp_id = ? ORDER BY position", (temp_id,)
+                )
+            ]
+        finally:
+            conn.execute("COMMIT")
+        parsed_data = json.loads(row[0])
+        parsed_data["sections"] = [json.loads(body) for body in bodies]
+        return parsed_data, row[1]
+
+    def exists(self, temp_id):
+        row = self._connection().execute("SELECT 1 FROM documents WHERE temp_id = ?", (temp_id,)).fetchone()
+        return row is not None
+
+    def revisions(self, temp_id):
+        """Revision log, newest first: [{"revision", "saved_at", "changes"}]"""
+        return [
+            {"revision": revision, "saved_at": saved_at, "changes": json.loads(changes)}
+            for revision, saved_at, changes in self._connection().execute(
+                "SELECT revision, saved_at, changes FROM revisions WHERE temp_id = ? ORDER BY revision DESC",
+                (temp_id,)
+            )
+        ]
+
+    # ---- writes ----
+
+    def create(self, temp_id, parsed_data, created_at=None):
+        """Insert a new document at revision 1; returns False if temp_id already exists"""
+        meta, sections = split_document(parsed_data)
+        now = time.time()
+        with self._transaction() as conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO documents (temp_id, meta, revision, created_at, updated_at) "
+                "VALUES (?, ?, 1, ?, ?)",
+                (temp_id, encode(meta), created_at or now, now)
+            ).rowcount
+            if not inserted:
+                return False
+            conn.executemany(
+                "INSERT INTO sections (temp_id, position, body) VALUES (?, ?, ?)",
+                [(temp_id, position, encode(section)) for position, section in enumerate(sections)]
+            )
+            self._log_revision(conn, temp_id, 1, now, {"created": True})
+        return True
+
+    def save(self, temp_id, parsed_data, expected_revision=None):
+        """
+        Store a full document, writing only the meta row and sections that
+        differ from the stored copy. Unchanged documents keep their revision.
+        Raises RevisionConflict if expected_revision is given and stale,
+        KeyError if the document doesn't exist. Returns the revision.
+        """
+        meta, sections = split_document(parsed_data)
+        new_meta = encode(meta)
+        new_bodies = [encode(section) for section in sections]
+
+        with self._transaction() as conn:
+            revision = self._current_revision(conn, temp_id, expected_revision)
+            old_meta = conn.execute("SELECT meta FROM documents WHERE temp_id = ?", (temp_id,)).fetchone()[0]
+            old_bodies = [
+                body for (body,) in conn.execute(
+                    "SELECT body FROM sections WHERE temp_id = ? ORDER BY position", (temp_id,)
+                )
+            ]
+
+            changed = [
+                position for position, body in enumerate(new_bodies)
+                if position >= len(old_bodies) or old_bodies[position] != body
+            ]
+            removed = list(range(len(new_bodies), len(old_bodies)))
+            meta_changed = new_meta != old_meta
+            if not (changed or removed or meta_changed):
+                return revision
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO sections (temp_id, position, body) VALUES (?, ?, ?)",
+                [(temp_id, position, new_bodies[position]) for position in changed]
+            )
+            if removed:
+                conn.execute("DELETE FROM sections WHERE temp_id = ? AND position >= ?", (temp_id, len(new_bodies)))
+            changed_fields = []
+            if meta_changed:
+                old_fields = json.loads(old_meta)
+                changed_fields = sorted(k for k in set(old_fields) | set(meta) if old_fields.get(k) != meta.get(k))
+            return self._bump(conn, temp_id, revision, new_meta if meta_changed else None, {
+                "meta": changed_fields, "sections": changed, "removed": removed,
+            })
+
+    def apply_changes(self, temp_id, expected_revision, meta=None, sections=None, section_count=None):
+        """
+        Apply a delta in one transaction: meta is {key: value} merged into the
+        document's top-level fields, sections is {position: section} replacing
+        whole sections, section_count truncates or extends the section list.
+        Raises RevisionConflict if expected_revision is stale, KeyError if the
+        document doesn't exist, ValueError for positions outside the document.
+        Returns the new revision.
+        """
+        meta = {key: value for key, value in (meta or {}).items() if key != "sections"}
+        sections = {int(position): section for position, section in (sections or {}).items()}
+
+        with self._transaction() as conn:
+            revision = self._current_revision(conn, temp_id, expected_revision)
+            (stored_count,) = conn.execute("SELECT COUNT(*) FROM sections WHERE temp_id = ?", (temp_id,)).fetchone()
+            count = stored_count if section_count is None else int(section_count)
+            if count < 0 or any(position < 0 or position >= count for position in sections):
+                raise ValueError("Section position out of range")
+            if count > stored_count and not all(p in sections for p in range(stored_count, count)):
+                raise ValueError("New sections must be sent in full")
+
+            new_meta = None
+            if meta:
+                stored_meta = json.loads(
+                    conn.execute("SELECT meta FROM documents WHERE temp_id = ?", (temp_id,)).fetchone()[0]
+                )
+                stored_meta.update(meta)
+                new_meta = encode(stored_meta)
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO sections (temp_id, position, body) VALUES (?, ?, ?)",
+                [(temp_id, position, encode(section)) for position, section in sections.items()]
+            )
+            removed = list(range(count, stored_count))
+            if removed:
+                conn.execute("DELETE FROM sections WHERE temp_id = ? AND position >= ?", (temp_id, count))
+            return self._bump(conn, temp_id, revision, new_meta, {
+                "meta": sorted(meta), "sections": sorted(sections), "removed": removed,
+            })
+
+    def delete(self, temp_id):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM documents WHERE temp_id = ?", (temp_id,))
+
+    def _current_revision(self, conn, temp_id, expected_revision):
+        row = conn.execute("SELECT revision FROM documents WHERE temp_id = ?", (temp_id,)).fetchone()
+        if row is None:
+            raise KeyError(temp_id)
+        if expected_revision is not None and int(expected_revision) != row[0]:
+            raise RevisionConflict(row[0])
+        return row[0]
+
+    def _bump(self, conn, temp_id, revision, new_meta, changes):
+        now = time.time()
+        if new_meta is None:
+            conn.execute(
+                "UPDATE documents SET revision = ?, updated_at = ? WHERE temp_id = ?",
+                (revision + 1, now, temp_id)
+            )
+        else:
+            conn.execute(
+                "UPDATE documents SET meta = ?, revision = ?, updated_at = ? WHERE temp_id = ?",
+                (new_meta, revision + 1, now, temp_id)
+            )
+        self._log_revision(conn, temp_id, revision + 1, now, changes)
+        return revision + 1
+
+    def _log_revision(self, conn, temp_id, revision, saved_at, changes):
+        conn.execute(
+            "INSERT INTO revisions (temp_id, revision, saved_at, changes) VALUES (?, ?, ?, ?)",
+            (temp_id, revision, saved_at, encode(changes))
+        )
+        conn.execute(
+            "DELETE FROM revisions WHERE temp_id = ? AND revision <= ?",
+            (temp_id, revision - REVISION_HISTORY)
+        )
+
+    # ---- migration ----
+
+    def migrate_json_files(self, folder):
+        """Import <temp_id>.json files not yet in the store; the files are left in place"""
+        imported = 0
+        for path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+            temp_id = os.path.splitext(os.path.basename(path))[0]
+            if self.exists(temp_id):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    parsed_data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[SKIP] Could not migrate {path}: {e}")
+                continue
+            if self.create(temp_id, parsed_data, created_at=os.path.getmtime(path)):
+                imported += 1
+        if imported:
+            print(f"[STORE] Migrated {imported} document(s) from {folder}")
+        return imported
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Shared document store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DocumentStore()
+    return _store
+
+
+# Import temp_data/*.json by hand:  python -m utils.doc_store [folder]
+if __name__ == "__main__":
+    import sys
+
+    get_store().migrate_json_files(sys.argv[1] if len(sys.argv) > 1 else "temp_data")
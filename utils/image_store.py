@@ -0,0 +1,151 @@
+# utils/image_store.py
+
+import hashlib
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import IMAGE_CONVERSIONS, IMAGE_CONVERSION_SECONDS
+
+# Every document image lives here once, named by a hash of its original bytes
+IMAGE_STORE_DIR = os.path.join("static", "images", "store")
+
+# Figures are \includegraphics[width=0.5\textwidth]; the IEEE text block is
+# about 7.16in wide, so 3.58in at 300 DPI is all the print ever needs
+TARGET_WIDTH_PX = 1075
+
+# Images decoded/resized at once; Pillow releases the GIL for most of it
+IMAGE_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+IMAGE_MARKER_PATTERN = re.compile(r'\[IMAGE:\s*(.*?)\]')
+
+_pool = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-store")
+
+
+def stored_name(data):
+    return hashlib.sha256(data).hexdigest()[:32] + ".png"
+
+
+def web_path(path):
+    return "/" + path.replace("\\", "/").lstrip("./")
+
+
+def local_path(img_path):
+    return os.path.join(".", img_path.strip().lstrip("/\\"))
+
+
+def normalize_image(data, target):
+    """Decode, flatten onto white, downscale to TARGET_WIDTH_PX and write a PNG"""
+    import io
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+            rgba = img.convert("RGBA")
+            flattened = Image.new("RGB", rgba.size, "white")
+            flattened.paste(rgba, mask=rgba.getchannel("A"))
+        else:
+            flattened = img.convert("RGB")
+
+        if flattened.width > TARGET_WIDTH_PX:
+            height = max(1, round(flattened.height * TARGET_WIDTH_PX / flattened.width))
+            flattened = flattened.resize((TARGET_WIDTH_PX, height), Image.LANCZOS)
+
+        # Write beside the target and rename so readers never see half a file
+        partial = f"{target}.{uuid.uuid4().hex}.part"
+        flattened.save(partial, "PNG")
+        os.replace(partial, target)
+
+
+def store_image_bytes(data):
+    """
+    Store image bytes and return their web path ("/static/images/store/<hash>.png"),
+    or None if they are not a readable image. Identical bytes are only
+    processed once; later calls return the existing file.
+    """
+    if not data:
+        return None
+    target = os.path.join(IMAGE_STORE_DIR, stored_name(data))
+    if not os.path.exists(target):
+        os.makedirs(IMAGE_STORE_DIR, exist_ok=True)
+        try:
+            with IMAGE_CONVERSION_SECONDS.time(stage="ingest"):
+                normalize_image(data, target)
+        except Exception as e:
+            IMAGE_CONVERSIONS.inc(stage="ingest", result="error")
+            print(f"[SKIP] Unreadable image ({len(data)} bytes): {e}")
+            return None
+        IMAGE_CONVERSIONS.inc(stage="ingest", result="ok")
+    return web_path(target)
+
+
+def store_image_file(img_path):
+    """store_image_bytes for a file given as a web or local path; stored images pass through"""
+    path = local_path(img_path)
+    if os.path.dirname(os.path.abspath(path)) == os.path.abspath(IMAGE_STORE_DIR) and os.path.exists(path):
+        return web_path(os.path.join(IMAGE_STORE_DIR, os.path.basename(path)))
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        print(f"[SKIP] Missing image {img_path}: {e}")
+        return None
+    return store_image_bytes(data)
+
+
+def submit_image_bytes(data):
+    """Start storing image bytes in the shared pool; returns a future of the web path"""
+    return _pool.submit(store_image_bytes, data)
+
+
+def store_image_files(img_paths, progress=None):
+    """
+    Store many images in parallel. Returns {original path: web path or None}.
+    progress(fraction) is called from this thread as images finish.
+    """
+    unique = list(dict.fromkeys(img_paths))
+    futures = [(img_path, _pool.submit(store_image_file, img_path)) for img_path in unique]
+    stored = {}
+    for done, (img_path, future) in enumerate(futures, start=1):
+        stored[img_path] = future.result()
+        if progress:
+            progress(done / len(futures))
+    return stored
+
+
+def document_texts(parsed_data):
+    """(container, key) for every text field of a parsed document that can hold image markers"""
+    fields = [(parsed_data, "abstract")]
+    for section in parsed_data.get("sections", []):
+        fields.append((section, "content"))
+        for sub in section.get("subsections", []):
+            fields.append((sub, "content"))
+    return [(container, key) for container, key in fields if container.get(key)]
+
+
+def ingest_document_images(parsed_data, progress=None):
+    """
+    Move every image a parsed document refers to into the store: image
+    markers in the text and parsed_data["images"] entries are rewritten to
+    the stored copies, and unreadable or missing images are dropped.
+    """
+    texts = document_texts(parsed_data)
+    paths = [m.strip() for container, key in texts for m in IMAGE_MARKER_PATTERN.findall(container[key])]
+    paths += [img["path"] for img in parsed_data.get("images", []) if img.get("path")]
+    stored = store_image_files(paths, progress)
+
+    def rewrite(match):
+        new_path = stored.get(match.group(1).strip())
+        return f"[IMAGE: {new_path}]" if new_path else ""
+
+    for container, key in texts:
+        container[key] = IMAGE_MARKER_PATTERN.sub(rewrite, container[key])
+
+    images = []
+    for img in parsed_data.get("images", []):
+        if stored.get(img.get("path")):
+            img["path"] = stored[img["path"]]
+            images.append(img)
+    parsed_data["images"] = images
+    return parsed_data
@@ -0,0 +1,179 @@
+# utils/jobs.py
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Max number of uploads processed at the same time
+MAX_CONCURRENT_JOBS = 2
+
+# Finished jobs are forgotten after this many seconds
+JOB_RETENTION_SECONDS = 3600
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once the user has asked to cancel it"""
+
+
+class JobFailed(Exception):
+    """Raised inside a job for errors that can be shown to the user as-is"""
+
+
+class Job:
+    def __init__(self, owner, stages):
+        self.id = str(uuid.uuid4())
+        self.owner = owner
+        self.stages = list(stages)
+        self.stage = None
+        self.stage_progress = 0.0
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.stage_timings = {}
+        self._stage_started = None
+        self._cancel_event = threading.Event()
+        self._future = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def progress(self):
+        """Overall progress in [0, 1] derived from the current stage"""
+        if self.status == "done":
+            return 1.0
+        if self.stage not in self.stages:
+            return 0.0
+        index = self.stages.index(self.stage)
+        return (index + self.stage_progress) / len(self.stages)
+
+    @property
+    def is_finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    def set_stage(self, stage, progress=0.0):
+        """Move to a pipeline stage; also a cancellation checkpoint"""
+        self.check_cancelled()
+        with self._lock:
+            self._close_stage()
+            self.stage = stage
+            self.stage_progress = max(0.0, min(1.0, progress))
+            self._stage_started = time.perf_counter()
+
+    def timings(self):
+        """Seconds per stage so far, including the stage still running"""
+        with self._lock:
+            timings = dict(self.stage_timings)
+            if self.stage is not None and self._stage_started is not None:
+                elapsed = time.perf_counter() - self._stage_started
+                timings[self.stage] = round(timings.get(self.stage, 0.0) + elapsed, 4)
+            return timings
+
+    def _close_stage(self):
+        # Seconds spent per stage; a stage entered twice (ZIP papers) accumulates
+        if self.stage is not None and self._stage_started is not None:
+            elapsed = time.perf_counter() - self._stage_started
+            self.stage_timings[self.stage] = round(self.stage_timings.get(self.stage, 0.0) + elapsed, 4)
+        self._stage_started = None
+
+    def set_progress(self, progress):
+        """Update progress within the current stage"""
+        self.check_cancelled()
+        with self._lock:
+            self.stage_progress = max(0.0, min(1.0, progress))
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        """Request cancellation; queued jobs are dropped immediately"""
+        self._cancel_event.set()
+        if self._future is not None and self._future.cancel():
+            self._finish("cancelled")
+
+    def add_done_callback(self, fn):
+        """Call fn(job) once the job is done, failed or cancelled (right away if it already is)"""
+        with self._lock:
+            if self.finished_at is None:
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _finish(self, status, result=None, error=None):
+        with self._lock:
+            self._close_stage()
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception as e:
+                print(f"[WARN] Callback for job {self.id} failed:", e)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": self.stages,
+            "stage_progress": round(self.stage_progress, 3),
+            "progress": round(self.progress, 3),
+            "stage_timings": dict(self.stage_timings),
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS, retention=JOB_RETENTION_SECONDS):
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner, stages, fn, *args, **kwargs):
+        """
+        Queue fn(job, *args, **kwargs) to run in the worker pool.
+        The return value of fn becomes job.result.
+        """
+        self._prune()
+        job = Job(owner, stages)
+        with self._lock:
+            self._jobs[job.id] = job
+        job._future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        if job._cancel_event.is_set():
+            job._finish("cancelled")
+            return
+        job.status = "running"
+        try:
+            result = fn(job, *args, **kwargs)
+            job._finish("done", result=result)
+        except JobCancelled:
+            job._finish("cancelled")
+        except JobFailed as e:
+            job._finish("failed", error=str(e))
+        except Exception as e:
+            print(f"[ERROR] Job {job.id} failed:", e)
+            job._finish("failed", error="Internal server error")
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at is not None and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
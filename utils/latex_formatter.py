@@ -1,17 +1,63 @@
 from jinja2 import Environment, BaseLoader
 import re
 import os
+import json
 import shutil
+import hashlib
+import uuid
+import time
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from datetime import datetime, timezone
+from collections import OrderedDict
+from .disk_cache import touch, enforce_size_limit
+from .metrics import IMAGE_CONVERSIONS, IMAGE_CONVERSION_SECONDS, PDFLATEX_SECONDS, PDF_RESULTS
 
-# Template for IEEE LaTeX with unique bibitem labels
-IEEE_TEMPLATE = r"""
+# Compiled PDFs are stored by content hash and served straight from here
+PDF_CACHE_DIR = os.path.join("static", "pdf_cache")
+PDF_CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+# Precompiled preamble formats live here, one per preamble version
+FORMAT_DIR = os.path.join("latex_cache", "formats")
+
+# pdflatex output that means the precompiled format itself could not be
+# loaded, as opposed to an error in the document (which may well say
+# "Use of \x doesn't match its definition", hence the ".fmt" anchors)
+FORMAT_LOAD_ERRORS = (
+    "I can't find the format file", "Fatal format file error",
+    ".fmt doesn't match", ".fmt was written by", "made by different executable",
+)
+
+# Non-PNG figures converted for pdflatex, reused across compiles
+CONVERTED_IMAGE_DIR = os.path.join("latex_cache", "images")
+CONVERTED_IMAGE_MAX_BYTES = 500 * 1024 * 1024
+
+# Max number of rendered heading/paragraph/reference fragments kept in memory
+FRAGMENT_CACHE_SIZE = 4096
+
+# Max number of remembered image validations, keyed by (path, mtime, size)
+IMAGE_CHECK_CACHE_SIZE = 4096
+
+# Figures validated/converted at once before a compile
+IMAGE_PREPARE_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# Fixed part of the preamble; it is dumped into a pdflatex format once and
+# reused by every compile (see build_preamble_format)
+IEEE_PREAMBLE = r"""
 \documentclass[conference]{IEEEtran}
 \usepackage{graphicx}
 \usepackage{float}  % helps with image placement
 \usepackage{amsmath}
 \usepackage{caption}
+"""
+
+# Template for IEEE LaTeX with unique bibitem labels.
+# Everything before \endofdump is skipped when the precompiled format is
+# loaded; hyperref must stay after it since it cannot be dumped.
+IEEE_TEMPLATE = IEEE_PREAMBLE + r"""\csname endofdump\endcsname
 \usepackage{hyperref}
 
 \title{<< title >>}
@@ -47,26 +93,54 @@ IEEE_TEMPLATE = r"""
 \end{document}
 """
 
+# Changes whenever the template does, so stale PDFs are never served
+TEMPLATE_VERSION = hashlib.sha256(IEEE_TEMPLATE.encode("utf-8")).hexdigest()[:12]
+# Bump when fragment rendering changes the LaTeX it produces
+RENDER_VERSION = "2"
+PREAMBLE_VERSION = hashlib.sha256(IEEE_PREAMBLE.encode("utf-8")).hexdigest()[:12]
+
+_format_lock = threading.Lock()
+_failed_formats = set()
+
+_fragment_cache = OrderedDict()
+_fragment_lock = threading.Lock()
+
+_image_check_cache = OrderedDict()
+_image_check_lock = threading.Lock()
+
+_image_pool = ThreadPoolExecutor(max_workers=IMAGE_PREPARE_WORKERS, thread_name_prefix="latex-images")
+
+_template = Environment(
+    loader=BaseLoader(),
+    variable_start_string='<<',
+    variable_end_string='>>',
+    autoescape=False
+).from_string(IEEE_TEMPLATE)
+
 # Escape LaTeX special characters
+LATEX_REPLACEMENTS = {
+    '&': r'\&', '%': r'\%', '$': r'\$', '#': r'\#',
+    '_': r'\_', '{': r'\{', '}': r'\}', '~': r'\textasciitilde{}',
+    '^': r'\^{}', '\\': r'\textbackslash{}',
+}
+LATEX_ESCAPE_PATTERN = re.compile('|'.join(re.escape(k) for k in LATEX_REPLACEMENTS))
+
 def latex_escape(text):
     if not isinstance(text, str):
         return text
-    replacements = {
-        '&': r'\&', '%': r'\%', '$': r'\$', '#': r'\#',
-        '_': r'\_', '{': r'\{', '}': r'\}', '~': r'\textasciitilde{}',
-        '^': r'\^{}', '\\': r'\textbackslash{}',
-    }
-    pattern = re.compile('|'.join(re.escape(k) for k in replacements))
-    return pattern.sub(lambda m: replacements[m.group()], text)
+    return LATEX_ESCAPE_PATTERN.sub(lambda m: LATEX_REPLACEMENTS[m.group()], text)
 
 # Convert image to PNG if needed
 def convert_to_png(src, dest):
     try:
-        with Image.open(src) as img:
-            rgb_img = img.convert('RGB')
-            rgb_img.save(dest, 'PNG')
+        with IMAGE_CONVERSION_SECONDS.time(stage="latex"):
+            with Image.open(src) as img:
+                rgb_img = img.convert('RGB')
+                rgb_img.save(dest, 'PNG')
+        IMAGE_CONVERSIONS.inc(stage="latex", result="ok")
         return True
     except Exception as e:
+        IMAGE_CONVERSIONS.inc(stage="latex", result="error")
         print("[ERROR] Failed to convert image:", e)
         return False
 
@@ -83,96 +157,434 @@ def is_valid_png(filepath):
 # Updated image pattern: matches [IMAGE: path]
 image_pattern = re.compile(r'\[IMAGE:\s*(.*?)\]')
 
+def resolve_image_path(img_path):
+    return os.path.join(".", img_path.strip().lstrip("/\\"))
+
+def image_stamp(full_src):
+    try:
+        stat = os.stat(full_src)
+        return [stat.st_mtime_ns, stat.st_size]
+    except OSError:
+        return None
+
+# is_valid_png, remembered per file version so unchanged images are opened once
+def is_valid_png_cached(full_src, stamp):
+    key = (os.path.abspath(full_src), stamp[0], stamp[1])
+    with _image_check_lock:
+        valid = _image_check_cache.get(key)
+        if valid is not None:
+            _image_check_cache.move_to_end(key)
+            return valid
+
+    valid = is_valid_png(full_src)
+    with _image_check_lock:
+        _image_check_cache[key] = valid
+        while len(_image_check_cache) > IMAGE_CHECK_CACHE_SIZE:
+            _image_check_cache.popitem(last=False)
+    return valid
+
+# PNG pdflatex can include for an image: the file itself or a cached conversion
+def figure_source(full_src, stamp, digest):
+    if is_valid_png_cached(full_src, stamp):
+        return full_src
+
+    # Conversions are kept per source version so they only happen once
+    converted = os.path.join(CONVERTED_IMAGE_DIR, f"{digest}_{stamp[0]}_{stamp[1]}.png")
+    if os.path.exists(converted):
+        touch(converted)
+        return converted
+
+    os.makedirs(CONVERTED_IMAGE_DIR, exist_ok=True)
+    # Partial files don't end in .png, so eviction never removes one mid-write
+    partial = f"{converted}.{uuid.uuid4().hex}.part"
+    if not convert_to_png(full_src, partial):
+        if os.path.exists(partial):
+            os.remove(partial)
+        return None
+    os.replace(partial, converted)
+    enforce_size_limit(CONVERTED_IMAGE_DIR, CONVERTED_IMAGE_MAX_BYTES, suffix=".png")
+    return converted
+
+def image_digest(full_src):
+    return hashlib.sha256(os.path.abspath(full_src).encode("utf-8")).hexdigest()[:16]
+
+def prepare_images(img_paths):
+    """
+    Validate (and convert if needed) every image a document refers to, in
+    parallel, so the figures rendered afterwards only hit the caches
+    """
+    jobs = []
+    for img_path in set(img_paths):
+        full_src = resolve_image_path(img_path)
+        stamp = image_stamp(full_src)
+        if stamp is not None:
+            jobs.append((full_src, stamp, image_digest(full_src)))
+    if len(jobs) > 1:
+        list(_image_pool.map(lambda job: figure_source(*job), jobs))
+
+# Turn one [IMAGE: path] marker into a figure plus the (source, stamp, digest, name) to stage
+def render_figure(img_path):
+    full_src = resolve_image_path(img_path)
+    stamp = image_stamp(full_src)
+    if stamp is None:
+        return r"\textbf{[Image not found]}", None
+
+    # Staged names are path hashes: unique per image and safe for \includegraphics
+    digest = image_digest(full_src)
+    staged_name = f"img_{digest}.png"
+
+    if figure_source(full_src, stamp, digest) is None:
+        return r"\textbf{[Image failed to render]}", None
+
+    caption = latex_escape(os.path.basename(img_path.strip()))
+    latex = (
+        r"\begin{figure}[H]\centering"
+        f"\n\\includegraphics[width=0.5\\textwidth]{{{staged_name}}}"
+        f"\n\\caption{{Image: {caption}}}"
+        r"\end{figure}"
+    )
+    return latex, (full_src, tuple(stamp), digest, staged_name)
+
+def fragment_key(text):
+    stamps = [
+        [img_path, image_stamp(resolve_image_path(img_path))]
+        for img_path in image_pattern.findall(text)
+    ]
+    payload = json.dumps([text, stamps], separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def render_fragment(text):
+    """
+    Render one heading, paragraph or reference to LaTeX: text is escaped and
+    image markers become figures. Returns (latex, images to stage). Results
+    are memoised by content (and referenced image versions), so regenerating
+    a document only re-renders the fragments that changed.
+    """
+    if not isinstance(text, str):
+        return text, ()
+
+    key = fragment_key(text)
+    with _fragment_lock:
+        cached = _fragment_cache.get(key)
+        if cached is not None:
+            _fragment_cache.move_to_end(key)
+            return cached
+
+    parts = []
+    images = []
+    last = 0
+    for match in image_pattern.finditer(text):
+        parts.append(latex_escape(text[last:match.start()]))
+        latex, staged = render_figure(match.group(1))
+        parts.append(latex)
+        if staged:
+            images.append(staged)
+        last = match.end()
+    parts.append(latex_escape(text[last:]))
+    fragment = ("".join(parts), tuple(images))
+
+    with _fragment_lock:
+        _fragment_cache[key] = fragment
+        while len(_fragment_cache) > FRAGMENT_CACHE_SIZE:
+            _fragment_cache.popitem(last=False)
+    return fragment
+
+# Link the images a set of fragments refers to into the build directory:
+# a hard link where possible, a symlink across filesystems, a copy as a last resort
+def stage_images(images, temp_image_dir):
+    for full_src, stamp, digest, staged_name in set(images):
+        dest = os.path.join(temp_image_dir, staged_name)
+        if os.path.exists(dest):
+            continue
+        # Resolved again here: a conversion may have been evicted since the
+        # fragment was rendered, and the source may have been deleted
+        src = figure_source(full_src, stamp, digest) if os.path.exists(full_src) else None
+        if src is None or not os.path.exists(src):
+            print(f"[SKIP] Image no longer available: {full_src}")
+            continue
+        try:
+            os.link(src, dest)
+        except FileNotFoundError:
+            print(f"[SKIP] Image no longer available: {full_src}")
+        except OSError:
+            try:
+                os.symlink(os.path.abspath(src), dest)
+            except OSError:
+                shutil.copy(src, dest)
+
 def render_images(content, image_dir, temp_image_dir):
-    def replace_image(match):
-        img_path = match.group(1).strip()
-        filename = os.path.basename(img_path)
-        full_src = os.path.join(".", img_path.lstrip("/\\"))
-        full_dest = os.path.join(temp_image_dir, filename)
-
-        if os.path.exists(full_src):
-            if is_valid_png(full_src):
-                shutil.copy(full_src, full_dest)
-            else:
-                if not convert_to_png(full_src, full_dest):
-                    return r"\textbf{[Image failed to render]}"
-            return (
-                r"\begin{figure}[H]\centering"
-                f"\n\\includegraphics[width=0.5\\textwidth]{{{filename}}}"
-                f"\n\\caption{{Image: {filename}}}"
-                r"\end{figure}"
-            )
-        else:
-            return r"\textbf{[Image not found]}"
-    
-    return image_pattern.sub(replace_image, content)
+    latex, images = render_fragment(content)
+    stage_images(images, temp_image_dir)
+    return latex
+
+
+
+def build_preamble_format():
+    """
+    Return the name of the precompiled IEEE_PREAMBLE format, building it with
+    mylatexformat on first use. Returns None if the format can't be built, in
+    which case callers compile the full preamble as before.
+    """
+    name = f"ieee_{PREAMBLE_VERSION}"
+    fmt_path = os.path.join(FORMAT_DIR, f"{name}.fmt")
+    if name in _failed_formats:
+        return None
+    if os.path.exists(fmt_path):
+        return name
+
+    with _format_lock:
+        if os.path.exists(fmt_path):
+            return name
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "preamble.tex"), "w", encoding="utf-8") as f:
+                f.write(IEEE_PREAMBLE + "\\begin{document}\n\\end{document}\n")
+
+            try:
+                result = subprocess.run(
+                    ["pdflatex", "-ini", "-interaction=nonstopmode", f"-jobname={name}",
+                     "&pdflatex", "mylatexformat.ltx", "preamble.tex"],
+                    cwd=tmpdir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=120
+                )
+            except (OSError, subprocess.TimeoutExpired) as e:
+                print("[WARN] Could not build preamble format:", e)
+                _failed_formats.add(name)
+                return None
+
+            built = os.path.join(tmpdir, f"{name}.fmt")
+            if not os.path.exists(built):
+                print("[WARN] Preamble format not generated:", result.stdout.decode("utf-8", "replace")[-500:])
+                _failed_formats.add(name)
+                return None
+
+            # Formats from older template versions are never loaded again
+            os.makedirs(FORMAT_DIR, exist_ok=True)
+            for old in os.listdir(FORMAT_DIR):
+                if old.startswith("ieee_") and old != f"{name}.fmt":
+                    try:
+                        os.remove(os.path.join(FORMAT_DIR, old))
+                    except OSError:
+                        # Another batch worker got there first
+                        pass
+            shutil.move(built, fmt_path)
+
+    return name
+
+
+def discard_preamble_format(name):
+    """
+    Drop a format pdflatex refused to load (e.g. after a TeX upgrade) and
+    stop using formats for this process, so later compiles don't pay for a
+    rebuild and a failed run every time
+    """
+    _failed_formats.add(name)
+    try:
+        os.remove(os.path.join(FORMAT_DIR, f"{name}.fmt"))
+    except OSError:
+        pass
+
+
+def format_load_failed(result, tmpdir):
+    """True if a compile failed because pdflatex could not load the format"""
+    output = result.stdout.decode("utf-8", "replace") + result.stderr.decode("utf-8", "replace")
+    try:
+        with open(os.path.join(tmpdir, "paper.log"), "r", encoding="utf-8", errors="replace") as f:
+            output += f.read()
+    except OSError:
+        pass
+    return any(message in output for message in FORMAT_LOAD_ERRORS)
+
+
+def run_pdflatex(tmpdir, tex_path, fmt_name=None):
+    command = ["pdflatex", "-interaction=nonstopmode", "-output-directory", tmpdir]
+    env = None
+    if fmt_name:
+        # kpathsea looks formats up via TEXFORMATS; the trailing separator keeps the defaults
+        env = dict(os.environ, TEXFORMATS=os.path.abspath(FORMAT_DIR) + os.pathsep)
+        command.append(f"-fmt={fmt_name}")
+    command.append(str(tex_path))
+    with PDFLATEX_SECONDS.time(format="yes" if fmt_name else "no"):
+        return subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
 
 
+# Keep only what ends up in the PDF, so cosmetic differences don't miss the cache
+def normalize_document(parsed_data):
+    def clean(value):
+        return value.strip() if isinstance(value, str) else value
+
+    def image_stamps(text):
+        return [
+            [img_path.strip(), image_stamp(resolve_image_path(img_path))]
+            for img_path in image_pattern.findall(text or "")
+        ]
+
+    sections = []
+    for section in parsed_data.get("sections", []):
+        subsections = [
+            {
+                "heading": clean(sub.get("heading", "")),
+                "content": clean(sub.get("content", "")),
+                "images": image_stamps(sub.get("content", "")),
+            }
+            for sub in section.get("subsections", [])
+        ]
+        sections.append({
+            "heading": clean(section.get("heading", "")),
+            "content": clean(section.get("content", "")),
+            "images": image_stamps(section.get("content", "")),
+            "subsections": subsections,
+        })
+
+    return {
+        "title": clean(parsed_data.get("title", "")),
+        "abstract": clean(parsed_data.get("abstract", "")),
+        "keywords": clean(parsed_data.get("keywords", "")),
+        "sections": sections,
+        "references": [clean(ref) for ref in parsed_data.get("references", [])],
+    }
+
+
+def document_cache_key(parsed_data):
+    payload = json.dumps(
+        {"template": TEMPLATE_VERSION, "renderer": RENDER_VERSION, "document": normalize_document(parsed_data)},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cached_pdf_result(cache_key, output_path=None, cached=False):
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        shutil.copyfile(os.path.join(PDF_CACHE_DIR, f"{cache_key}.pdf"), output_path)
+    return {
+        "success": True,
+        "pdf_url": f"/static/pdf_cache/{cache_key}.pdf",
+        "cache_key": cache_key,
+        "cached": cached,
+    }
+
 
 # Main PDF generation function
-def generate_pdf_from_data(parsed_data, output_path="static/temp.pdf"):
+def generate_pdf_from_data(parsed_data, output_path=None, use_cache=True, use_format=True):
+    """
+    Compile parsed document data into an IEEE PDF.
+    Every revision gets its own file under PDF_CACHE_DIR, named by a hash of the
+    normalized document and template version; an unchanged document is served
+    from there without running pdflatex. The PDF is also copied to output_path if given.
+    Compiles load the precompiled preamble format unless use_format is False.
+    """
     try:
         from pathlib import Path
-        import tempfile
-        import subprocess
 
-        parsed_data["title"] = latex_escape(parsed_data.get("title", ""))
-        parsed_data["abstract"] = latex_escape(parsed_data.get("abstract", ""))
-        parsed_data["keywords"] = latex_escape(parsed_data.get("keywords", ""))
+        cache_key = document_cache_key(parsed_data)
+        cache_path = os.path.join(PDF_CACHE_DIR, f"{cache_key}.pdf")
+        if use_cache and os.path.exists(cache_path):
+            touch(cache_path)
+            PDF_RESULTS.inc(result="cached")
+            return cached_pdf_result(cache_key, output_path, cached=True)
+
+        # Check and convert all figures up front, in parallel
+        prepare_images(
+            img_path
+            for section in parsed_data.get("sections", [])
+            for text in [section.get("content")] + [sub.get("content") for sub in section.get("subsections", [])]
+            for img_path in image_pattern.findall(text or "")
+        )
+
+        # Build the template context from cached fragments; only headings,
+        # paragraphs and references that changed since last time are rendered
+        images = []
+
+        def render(text):
+            latex, fragment_images = render_fragment(text)
+            images.extend(fragment_images)
+            return latex
+
+        sections = []
+        for section in parsed_data.get("sections", []):
+            sections.append({
+                "heading": render(section.get("heading", "")),
+                "content": render(section.get("content", "")),
+                "subsections": [
+                    {"heading": render(sub.get("heading", "")), "content": render(sub.get("content", ""))}
+                    for sub in section.get("subsections", [])
+                ],
+            })
+
+        context = {
+            "title": latex_escape(parsed_data.get("title", "")),
+            "abstract": latex_escape(parsed_data.get("abstract", "")),
+            "keywords": latex_escape(parsed_data.get("keywords", "")),
+            "sections": sections,
+            "references": [render(ref) for ref in parsed_data.get("references", [])],
+        }
+        tex_code = _template.render(**context)
 
         with tempfile.TemporaryDirectory() as tmpdir:
-            for section in parsed_data.get("sections", []):
-                section["heading"] = latex_escape(section.get("heading", ""))
-
-                # First render images, then escape text
-                raw_content = section.get("content", "")
-                rendered_content = render_images(raw_content, '', tmpdir)
-                section["content"] = latex_escape(rendered_content)
-
-                for sub in section.get("subsections", []):
-                    sub["heading"] = latex_escape(sub.get("heading", ""))
-                    raw_sub_content = sub.get("content", "")
-                    rendered_sub = render_images(raw_sub_content, '', tmpdir)
-                    sub["content"] = latex_escape(rendered_sub)
-
-            # Escape references
-            parsed_data["references"] = [latex_escape(ref) for ref in parsed_data.get("references", [])]
-
-            # Render LaTeX
-            env = Environment(
-                loader=BaseLoader(),
-                variable_start_string='<<',
-                variable_end_string='>>',
-                autoescape=False
-            )
-            template = env.from_string(IEEE_TEMPLATE)
-            tex_code = template.render(**parsed_data)
+            stage_images(images, tmpdir)
 
             tex_path = Path(tmpdir) / "paper.tex"
             with open(tex_path, "w", encoding="utf-8") as f:
                 f.write(tex_code)
 
-            # Run pdflatex
-            result = subprocess.run(
-                ["pdflatex", "-interaction=nonstopmode", "-output-directory", tmpdir, str(tex_path)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
+            # Run pdflatex, preferring the precompiled preamble
+            started = time.perf_counter()
+            fmt_name = build_preamble_format() if use_format else None
+            result = run_pdflatex(tmpdir, tex_path, fmt_name)
 
             pdf_path = Path(tmpdir) / "paper.pdf"
+            # Errors in the document itself fail either way; only a format
+            # pdflatex refuses to load is discarded and retried without
+            if fmt_name and not pdf_path.exists() and format_load_failed(result, tmpdir):
+                print("[WARN] Preamble format could not be loaded, retrying without it")
+                discard_preamble_format(fmt_name)
+                result = run_pdflatex(tmpdir, tex_path)
+            compile_seconds = time.perf_counter() - started
+
             if pdf_path.exists():
-                os.makedirs("static", exist_ok=True)
-                os.replace(pdf_path, output_path)
-                return {"success": True}
+                # Move across filesystems first, then publish atomically
+                os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+                partial_path = f"{cache_path}.{uuid.uuid4().hex}.part"
+                shutil.move(str(pdf_path), partial_path)
+                os.replace(partial_path, cache_path)
+                enforce_size_limit(PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES, suffix=".pdf")
+                pdf_result = cached_pdf_result(cache_key, output_path)
+                pdf_result["compile_seconds"] = round(compile_seconds, 3)
+                PDF_RESULTS.inc(result="compiled")
+                return pdf_result
             else:
+                PDF_RESULTS.inc(result="latex_failed")
                 return {
                     "error": "LaTeX ran but PDF not generated.",
                     "log": result.stdout.decode("utf-8") + "\n" + result.stderr.decode("utf-8")
                 }
 
     except FileNotFoundError as e:
+        PDF_RESULTS.inc(result="error")
         return {"error": f"Missing executable: {e.filename}. Is it installed and in your system PATH?"}
     except Exception as e:
         print("[ERROR] Subprocess failed:", e)
+        PDF_RESULTS.inc(result="error")
         return {"error": str(e)}
 
+
+# Compare compile times with and without the precompiled preamble:
+#   python -m utils.latex_formatter temp_data/<id>.json [runs]
+if __name__ == "__main__":
+    import sys
+
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        document = json.load(f)
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    build_started = time.perf_counter()
+    print("Format:", build_preamble_format(), f"(ready in {time.perf_counter() - build_started:.2f}s)")
+    for use_format in (False, True):
+        timings = []
+        for _ in range(runs):
+            outcome = generate_pdf_from_data(document, use_cache=False, use_format=use_format)
+            if "error" in outcome:
+                sys.exit(outcome["error"])
+            timings.append(outcome["compile_seconds"])
+        label = "with format" if use_format else "full preamble"
+        print(f"{label:>13}: best {min(timings):.3f}s, mean {sum(timings) / len(timings):.3f}s")
@@ -0,0 +1,78 @@
+# utils/llm_cache.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from .disk_cache import touch, enforce_size_limit
+from .metrics import LLM_CACHE
+
+# Model responses are stored here as one JSON file per prompt
+LLM_CACHE_DIR = "llm_cache"
+LLM_CACHE_TTL = 7 * 24 * 3600
+LLM_CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+_stats = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0}
+_stats_lock = threading.Lock()
+
+# result label of ieee_llm_cache_total for each cache_stats() field
+_METRIC_RESULTS = {"hits": "hit", "misses": "miss", "bypassed": "bypass", "stores": "store"}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+    LLM_CACHE.inc(result=_METRIC_RESULTS[name])
+
+
+def cache_key(model, temperature, prompt_version, prompt):
+    """Key on everything that changes the answer: model, sampling and the prompt"""
+    input_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    payload = json.dumps([model, temperature, prompt_version, input_hash])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def lookup(key, refresh=False):
+    """Return the cached value for key, or None on a miss, expiry or refresh"""
+    if refresh:
+        _count("bypassed")
+        return None
+
+    path = os.path.join(LLM_CACHE_DIR, f"{key}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        _count("misses")
+        return None
+
+    if time.time() - entry.get("created", 0) > LLM_CACHE_TTL:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        _count("misses")
+        return None
+
+    touch(path)
+    _count("hits")
+    return entry["value"]
+
+
+def store(key, value):
+    os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+    path = os.path.join(LLM_CACHE_DIR, f"{key}.json")
+    partial_path = f"{path}.{uuid.uuid4().hex}.part"
+    with open(partial_path, "w", encoding="utf-8") as f:
+        json.dump({"created": time.time(), "value": value}, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(partial_path, path)
+    _count("stores")
+    enforce_size_limit(LLM_CACHE_DIR, LLM_CACHE_MAX_BYTES, suffix=".json")
+
+
+def cache_stats():
+    with _stats_lock:
+        return dict(_stats)
@@ -1,40 +1,209 @@
 # utils/llm_formatter.py
 
-import subprocess
-import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from .ollama_client import get_client, stream_generate, OllamaTimeout
+from . import llm_cache
+from .prompt_builder import build_document_prompt, build_text_prompts, document_fits
 
-def generate_ieee_markdown(parsed_data, model="llama3", temperature=0.3):
+# Model used to reformat whole papers
+IEEE_MODEL = "llama3"
+
+# Bump when build_ieee_prompt changes so cached answers are not reused
+IEEE_PROMPT_VERSION = "3"
+
+# Bump when the per-section prompts change
+SECTION_PROMPT_VERSION = "3"
+
+# Section prompts in flight at once for one paper (the client also limits per model)
+MAX_SECTION_FANOUT = 4
+
+TIMEOUT_ERROR = "Ollama model timed out. Try reducing input size or switching model."
+
+# Leading "1.", "2.3)", "IV." etc. on headings; numbering is redone when stitching
+HEADING_NUMBER_PATTERN = re.compile(r'^\s*(?:\d+(?:\.\d+)*|[IVXLC]+)[\.\)]?\s+')
+
+IEEE_INSTRUCTIONS = (
+    "You are an expert in academic formatting. Reformat the given academic paper into IEEE format.\n\n"
+    "Requirements:\n"
+    "- Use IEEE structure: Title, Abstract, Keywords, numbered sections (1. Introduction, 2. Methodology, etc.).\n"
+    "- Keep original meaning, don't invent content.\n"
+    "- Format in clean, well-structured Markdown for readability and easy LaTeX/DOCX conversion.\n"
+    "- Use proper IEEE-style tone.\n"
+    "- Do not write a References section; it is added separately.\n"
+)
+
+def build_ieee_prompt(parsed_data, model=IEEE_MODEL):
+    # Compact JSON without images or references; long papers go through plan_chunks instead
+    return build_document_prompt("ieee_markdown", model, IEEE_INSTRUCTIONS, parsed_data)
+
+
+def build_passage_prompts(kind, heading, text, model=IEEE_MODEL):
     """
-    Uses Ollama to generate IEEE-formatted Markdown text from parsed document JSON.
+    Prompts for one abstract, section or subsection. Text over the model's
+    budget is split at paragraph (or sentence) boundaries into several
+    prompts whose answers are joined in order, so no content is lost.
     """
-    system_prompt = (
-        "You are an expert in academic formatting. Reformat the given academic paper into IEEE format.\n\n"
+    instructions = (
+        "You are an expert in academic formatting. Rewrite the following "
+        f"{kind} of an academic paper in IEEE style.\n\n"
         "Requirements:\n"
-        "- Use IEEE structure: Title, Abstract, Keywords, numbered sections (1. Introduction, 2. Methodology, etc.).\n"
+        "- Return only Markdown paragraphs (lists and tables are fine); do not add any headings.\n"
         "- Keep original meaning, don't invent content.\n"
-        "- Format in clean, well-structured Markdown for readability and easy LaTeX/DOCX conversion.\n"
-        "- Use proper IEEE-style tone.\n"
+        "- Use proper IEEE-style tone.\n\n"
+        f"Heading: {heading}\n\n"
+        "Text:\n"
     )
+    return build_text_prompts("ieee_section", model, instructions, text)
+
+
+def references_markdown(parsed_data):
+    references = [ref.strip() for ref in parsed_data.get("references", []) if ref and ref.strip()]
+    if not references:
+        return ""
+    return "## References\n\n" + "".join(f"[{n}] {ref}\n\n" for n, ref in enumerate(references, start=1))
+
+
+def is_long_document(parsed_data, model=IEEE_MODEL):
+    """Papers that don't fit one prompt are formatted section by section"""
+    return not document_fits(parsed_data, model, IEEE_INSTRUCTIONS)
+
+
+def plan_chunks(parsed_data, model=IEEE_MODEL):
+    """
+    Split a paper into ordered pieces for map-reduce formatting: literal
+    Markdown (headings with consistent numbering, references) and prompts
+    whose answers fill in the text between them.
+    """
+    def clean_heading(heading):
+        return HEADING_NUMBER_PATTERN.sub("", (heading or "").strip()) or "Untitled"
+
+    pieces = [("text", f"# {(parsed_data.get('title') or '').strip()}\n\n")]
+
+    def add_passage(kind, heading, text):
+        for prompt in build_passage_prompts(kind, heading, text, model):
+            pieces.append(("prompt", prompt))
+            pieces.append(("text", "\n\n"))
+
+    abstract = (parsed_data.get("abstract") or "").strip()
+    if abstract:
+        pieces.append(("text", "**Abstract**—"))
+        add_passage("abstract", "Abstract", abstract)
+
+    keywords = (parsed_data.get("keywords") or "").strip()
+    if keywords:
+        pieces.append(("text", f"**Index Terms**—{keywords}\n\n"))
 
-    # Create input prompt for the LLM
-    user_prompt = f"{system_prompt}\n\nParsed Data:\n{json.dumps(parsed_data, indent=2)}"
+    for i, section in enumerate(parsed_data.get("sections", []), start=1):
+        heading = clean_heading(section.get("heading"))
+        pieces.append(("text", f"## {i}. {heading}\n\n"))
+        content = (section.get("content") or "").strip()
+        if content:
+            add_passage("section", heading, content)
 
+        for j, sub in enumerate(section.get("subsections", []), start=1):
+            sub_heading = clean_heading(sub.get("heading"))
+            pieces.append(("text", f"### {i}.{j} {sub_heading}\n\n"))
+            sub_content = (sub.get("content") or "").strip()
+            if sub_content:
+                add_passage("subsection", sub_heading, sub_content)
+
+    pieces.append(("text", references_markdown(parsed_data)))
+
+    return pieces
+
+
+def format_passage(prompt, model, temperature, refresh=False):
+    key = llm_cache.cache_key(model, temperature, SECTION_PROMPT_VERSION, prompt)
+    cached = llm_cache.lookup(key, refresh=refresh)
+    if cached is not None:
+        return cached
+
+    output = get_client().generate(model, prompt, {"temperature": temperature})
+    # Headings come from the stitcher, drop any the model added anyway
+    body = "\n".join(line for line in output.strip().splitlines() if not line.lstrip().startswith("#")).strip()
+    llm_cache.store(key, body)
+    return body
+
+
+def iter_ieee_markdown_chunks(parsed_data, model=IEEE_MODEL, temperature=0.3, refresh=False):
+    """
+    Map-reduce formatting for long papers: every section, subsection and the
+    abstract is formatted by its own prompt, MAX_SECTION_FANOUT at a time,
+    and the results are yielded in document order as they become available.
+    """
+    pieces = plan_chunks(parsed_data, model)
+    pool = ThreadPoolExecutor(max_workers=MAX_SECTION_FANOUT, thread_name_prefix="ieee-section")
     try:
-        result = subprocess.run(
-            ["ollama", "run", model],
-            input=user_prompt.encode("utf-8"),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=180
-        )
-        if result.returncode != 0:
-            return {"error": result.stderr.decode("utf-8")}
+        futures = [
+            pool.submit(format_passage, value, model, temperature, refresh) if kind == "prompt" else None
+            for kind, value in pieces
+        ]
+        for (kind, value), future in zip(pieces, futures):
+            yield value if future is None else future.result()
+    finally:
+        # Stop queued prompts if the caller gave up (e.g. the client disconnected)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def generate_ieee_markdown(parsed_data, model=IEEE_MODEL, temperature=0.3, refresh=False):
+    """
+    Uses Ollama to generate IEEE-formatted Markdown text from parsed document JSON.
+    Answers are cached on disk; refresh=True forces a new generation.
+    Long papers are formatted per section (see iter_ieee_markdown_chunks).
+    """
+    if is_long_document(parsed_data, model):
+        try:
+            markdown = "".join(iter_ieee_markdown_chunks(parsed_data, model, temperature, refresh))
+            return {"formatted_markdown": markdown.strip()}
+        except OllamaTimeout:
+            return {"error": TIMEOUT_ERROR}
+        except Exception as e:
+            return {"error": str(e)}
 
+    user_prompt = build_ieee_prompt(parsed_data, model)
+    key = llm_cache.cache_key(model, temperature, IEEE_PROMPT_VERSION, user_prompt)
+    references = references_markdown(parsed_data)
+    cached = llm_cache.lookup(key, refresh=refresh)
+    if cached is not None:
+        return {"formatted_markdown": f"{cached}\n\n{references}".strip(), "cached": True}
+
+    try:
+        markdown = get_client().generate(model, user_prompt, {"temperature": temperature}).strip()
+        llm_cache.store(key, markdown)
         return {
-            "formatted_markdown": result.stdout.decode("utf-8").strip()
+            "formatted_markdown": f"{markdown}\n\n{references}".strip()
         }
 
-    except subprocess.TimeoutExpired:
-        return {"error": "Ollama model timed out. Try reducing input size or switching model."}
+    except OllamaTimeout:
+        return {"error": TIMEOUT_ERROR}
     except Exception as e:
         return {"error": str(e)}
+
+
+def stream_ieee_markdown(parsed_data, model=IEEE_MODEL, temperature=0.3, refresh=False):
+    """
+    Same prompt as generate_ieee_markdown, but yields Markdown tokens as the
+    model produces them via the Ollama HTTP API. A cached answer is yielded
+    in one piece; a stream is only cached if it ran to completion.
+    Long papers yield one formatted section at a time instead.
+    """
+    if is_long_document(parsed_data, model):
+        yield from iter_ieee_markdown_chunks(parsed_data, model, temperature, refresh)
+        return
+
+    user_prompt = build_ieee_prompt(parsed_data, model)
+    key = llm_cache.cache_key(model, temperature, IEEE_PROMPT_VERSION, user_prompt)
+    references = references_markdown(parsed_data)
+    cached = llm_cache.lookup(key, refresh=refresh)
+    if cached is not None:
+        yield cached
+    else:
+        tokens = []
+        for token in stream_generate(model, user_prompt, {"temperature": temperature}):
+            tokens.append(token)
+            yield token
+        llm_cache.store(key, "".join(tokens).strip())
+
+    if references:
+        yield f"\n\n{references}"
@@ -0,0 +1,221 @@
+# utils/metrics.py
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets (seconds) shared by most timing histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Upload sizes (bytes): 10KB .. 100MB
+SIZE_BUCKETS = (1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8)
+
+# Prompt sizes (estimated tokens)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 3000, 4000, 6000, 8000)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic count, optionally split by labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _drain(self):
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def _merge(self, values):
+        with self._lock:
+            for key, amount in values.items():
+                self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts plus sum and count, optionally split by labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _drain(self):
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def _merge(self, values):
+        with self._lock:
+            for key, (counts, total) in values.items():
+                old_counts, old_total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+                self._values[key] = ([a + b for a, b in zip(old_counts, counts)], old_total + total)
+
+    def _samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render_metrics():
+    """All registered metrics in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+def drain_metrics():
+    """
+    Take everything recorded so far and reset it, keyed by metric name.
+    Worker processes return this with their results so the parent can
+    merge_metrics() it into what /metrics serves.
+    """
+    with _registry_lock:
+        metrics = list(_registry)
+    return {metric.name: metric._drain() for metric in metrics}
+
+
+def merge_metrics(recorded):
+    """Add values from drain_metrics() in another process to this process's metrics"""
+    with _registry_lock:
+        by_name = {metric.name: metric for metric in _registry}
+    for name, values in recorded.items():
+        if name in by_name and values:
+            by_name[name]._merge(values)
+
+
+# ---- pipeline metrics ----
+
+UPLOAD_BYTES = Histogram(
+    "ieee_upload_bytes", "Size of uploaded files.", ["file_type"], buckets=SIZE_BUCKETS)
+PARSE_SECONDS = Histogram(
+    "ieee_parse_seconds", "Time to parse one input file.", ["file_type"])
+PARSE_STRATEGY = Counter(
+    "ieee_pdf_parse_strategy_total", "PDF parses by the strategy whose result was used.", ["strategy"])
+IMAGE_CONVERSIONS = Counter(
+    "ieee_image_conversions_total", "Images decoded and re-encoded.", ["stage", "result"])
+IMAGE_CONVERSION_SECONDS = Histogram(
+    "ieee_image_conversion_seconds", "Time to convert one image.", ["stage"])
+LLM_SECONDS = Histogram(
+    "ieee_llm_request_seconds", "Ollama request latency, until the full answer.", ["model", "mode"])
+LLM_ERRORS = Counter(
+    "ieee_llm_errors_total", "Ollama requests that failed.", ["model", "reason"])
+PROMPT_TOKENS = Histogram(
+    "ieee_prompt_tokens", "Estimated input tokens per prompt.", ["call_site"], buckets=TOKEN_BUCKETS)
+LLM_CACHE = Counter(
+    "ieee_llm_cache_total", "LLM answer cache lookups and stores.", ["result"])
+PROMPT_TRUNCATIONS = Counter(
+    "ieee_prompts_truncated_total", "Prompts whose input text was cut to fit the token budget.", ["call_site"])
+PDFLATEX_SECONDS = Histogram(
+    "ieee_pdflatex_seconds", "Duration of one pdflatex run.", ["format"])
+PDF_RESULTS = Counter(
+    "ieee_pdf_results_total", "PDF generation outcomes.", ["result"])
+MONGO_SECONDS = Histogram(
+    "ieee_mongo_command_seconds", "MongoDB command latency.", ["command", "result"])
+
+
+class MongoCommandMetrics:
+    """pymongo CommandListener feeding MONGO_SECONDS"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, result="ok")
+
+    def failed(self, event):
+        MONGO_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, result="error")
+
+
+def mongo_listener():
+    """A CommandListener instance (pymongo is only imported when asked for one)"""
+    from pymongo import monitoring
+
+    class Listener(MongoCommandMetrics, monitoring.CommandListener):
+        pass
+
+    return Listener()
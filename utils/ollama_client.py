@@ -0,0 +1,275 @@
+# utils/ollama_client.py
+
+import contextlib
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+import urllib.parse
+
+from .metrics import LLM_SECONDS, LLM_ERRORS
+from .serving import on_hub, iterate_on_hub, bounded_semaphore
+
+# Base URL of the local Ollama (or compatible) HTTP API
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+if "://" not in OLLAMA_HOST:
+    OLLAMA_HOST = f"http://{OLLAMA_HOST}"
+
+# Seconds to wait for the server (covers slow first tokens on a cold model)
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "180"))
+
+# Extra attempts for connection errors and 5xx responses
+OLLAMA_RETRIES = int(os.environ.get("OLLAMA_RETRIES", "2"))
+
+# How long Ollama keeps a model loaded after our last request
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+# Requests allowed in flight per model; the rest wait their turn
+OLLAMA_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "2"))
+
+# Idle keep-alive connections kept for reuse
+OLLAMA_POOL_SIZE = 8
+
+# Context window per model, sent as num_ctx with every request (Ollama
+# otherwise uses its smaller default and silently cuts long prompts).
+# Loads send it too: a request with a different num_ctx reloads the model.
+MODEL_CONTEXT_TOKENS = {
+    "llama3": 8192,
+    "phi3:mini": 4096,
+}
+DEFAULT_CONTEXT_TOKENS = 4096
+
+
+def context_tokens(model):
+    return MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+
+
+def model_options(model, options=None):
+    """Request options for model: the caller's, plus the model's num_ctx"""
+    return {"num_ctx": context_tokens(model), **(options or {})}
+
+
+class OllamaError(Exception):
+    """The server could not be reached or answered with an error"""
+
+
+class OllamaTimeout(OllamaError):
+    """The server did not answer within the timeout"""
+
+
+class OllamaClient:
+    """
+    Thread-safe client for the Ollama HTTP API that reuses keep-alive
+    connections and limits concurrent requests per model. Under gevent
+    every request runs on the hub (see utils.serving.on_hub), so pooled
+    connections stay on the thread that opened them.
+    """
+
+    def __init__(self, host=OLLAMA_HOST, timeout=OLLAMA_TIMEOUT, retries=OLLAMA_RETRIES,
+                 keep_alive=OLLAMA_KEEP_ALIVE, max_concurrency=OLLAMA_MAX_CONCURRENCY,
+                 pool_size=OLLAMA_POOL_SIZE):
+        url = urllib.parse.urlsplit(host if "://" in host else f"http://{host}")
+        self.host = host
+        self.timeout = timeout
+        self.retries = retries
+        self.keep_alive = keep_alive
+        self.max_concurrency = max_concurrency
+        self._connection_class = (
+            http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        )
+        self._netloc = url.netloc
+        self._base_path = url.path.rstrip("/")
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._semaphores = {}
+        self._semaphores_lock = threading.Lock()
+
+    # ---- connection pool ----
+
+    def _acquire_connection(self, timeout):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connection_class(self._netloc, timeout=timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def _release_connection(self, conn, reusable=True):
+        if not reusable:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _semaphore(self, model):
+        with self._semaphores_lock:
+            if model not in self._semaphores:
+                self._semaphores[model] = bounded_semaphore(self.max_concurrency)
+            return self._semaphores[model]
+
+    def _post(self, path, payload, timeout):
+        """
+        Send a JSON POST and return (connection, response) once the status is OK.
+        Connection errors (including stale pooled connections) and 5xx
+        responses are retried; timeouts are not.
+        """
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        last_error = None
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(min(0.5 * 2 ** (attempt - 1), 4))
+
+            conn = self._acquire_connection(timeout)
+            try:
+                conn.request("POST", self._base_path + path, body, headers)
+                response = conn.getresponse()
+            except TimeoutError:
+                conn.close()
+                raise OllamaTimeout(f"Ollama did not answer within {timeout}s")
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                last_error = e
+                continue
+
+            if response.status >= 500 and attempt < self.retries:
+                response.read()
+                self._release_connection(conn, not response.will_close)
+                last_error = OllamaError(f"Ollama returned HTTP {response.status}")
+                continue
+            if response.status >= 400:
+                detail = response.read().decode("utf-8", "replace")
+                self._release_connection(conn, not response.will_close)
+                try:
+                    detail = json.loads(detail).get("error", detail)
+                except ValueError:
+                    pass
+                raise OllamaError(f"Ollama returned HTTP {response.status}: {detail}")
+            return conn, response
+
+        raise OllamaError(f"Could not reach Ollama at {self.host}: {last_error}")
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _count_errors(model):
+        try:
+            yield
+        except OllamaTimeout:
+            LLM_ERRORS.inc(model=model, reason="timeout")
+            raise
+        except OllamaError:
+            LLM_ERRORS.inc(model=model, reason="error")
+            raise
+
+    # ---- API ----
+
+    def generate(self, model, prompt, options=None, timeout=None):
+        """Return the full completion for prompt"""
+        return on_hub(self._generate, model, prompt, options, timeout)
+
+    def _generate(self, model, prompt, options, timeout):
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": model_options(model, options),
+        }
+        timeout = timeout or self.timeout
+        started = time.perf_counter()
+        with self._count_errors(model), self._semaphore(model):
+            conn, response = self._post("/api/generate", payload, timeout)
+            try:
+                data = json.loads(response.read())
+            except TimeoutError:
+                conn.close()
+                raise OllamaTimeout(f"Ollama did not answer within {timeout}s")
+            except Exception:
+                conn.close()
+                raise
+            self._release_connection(conn, not response.will_close)
+
+            if data.get("error"):
+                raise OllamaError(data["error"])
+        LLM_SECONDS.observe(time.perf_counter() - started, model=model, mode="generate")
+        return data.get("response", "")
+
+    def stream(self, model, prompt, options=None, timeout=None):
+        """
+        Yield completion text as the model produces it. Closing the generator
+        early closes the connection, which makes Ollama stop generating.
+        """
+        return iterate_on_hub(self._stream(model, prompt, options, timeout))
+
+    def _stream(self, model, prompt, options, timeout):
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+            "options": model_options(model, options),
+        }
+        timeout = timeout or self.timeout
+        started = time.perf_counter()
+        with self._count_errors(model), self._semaphore(model):
+            conn, response = self._post("/api/generate", payload, timeout)
+            finished = False
+            try:
+                while True:
+                    try:
+                        line = response.readline()
+                    except TimeoutError:
+                        raise OllamaTimeout(f"Ollama stopped responding for {timeout}s")
+                    if not line:
+                        break
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise OllamaError(chunk["error"])
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        response.read()
+                        finished = True
+                        break
+            finally:
+                self._release_connection(conn, finished and not response.will_close)
+        if finished:
+            LLM_SECONDS.observe(time.perf_counter() - started, model=model, mode="stream")
+
+    def load(self, model, timeout=None):
+        """Load model into memory (a generate call without a prompt)"""
+        on_hub(self._load, model, timeout)
+
+    def _load(self, model, timeout):
+        payload = {"model": model, "keep_alive": self.keep_alive, "options": model_options(model)}
+        with self._semaphore(model):
+            conn, response = self._post("/api/generate", payload, timeout or self.timeout)
+            response.read()
+            self._release_connection(conn, not response.will_close)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Shared client used by every LLM call site"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OllamaClient()
+    return _client
+
+
+def stream_generate(model, prompt, options=None, timeout=None):
+    """Yield completion text from the shared client as it arrives"""
+    yield from get_client().stream(model, prompt, options, timeout)
@@ -1,37 +1,66 @@
 import os
+import sys
+import time
+import shutil
+import signal
 import zipfile
+import tempfile
+import multiprocessing
 import subprocess
+import concurrent.futures
 from pathlib import Path
-from pdf2docx import Converter
-from .pdf_parser import AcademicPDFParser
+from .pdf_parser import AcademicPDFParser, PARALLEL_EXTRACT_MIN_PAGES, share_cpus, cpu_share
 from .word_parser import parse_docx
+from .metrics import PARSE_SECONDS, PARSE_STRATEGY, drain_metrics, merge_metrics
+
+# Seconds the speculative pdf2docx conversion may run, counted from its own
+# start; the direct parse is always waited for
+PDF_PARSE_DEADLINE = 120
+
+# Processes pdf2docx may use for large PDFs (its multi-processing mode),
+# further capped to the CPU share of batch and ZIP workers
+PDF2DOCX_PROCESSES = os.cpu_count() or 1
+
+# Seconds LibreOffice may take to convert one .doc before it is killed
+DOC_CONVERSION_TIMEOUT = 120
+
+# Directory holding the utils package, for running this module in a child process
+REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+
+EMPTY_RESULT = {"sections": [], "abstract": ""}
+
+# ZIP uploads: papers per archive, bytes per paper and bytes in total once decompressed
+ZIP_MAX_ENTRIES = 100
+ZIP_MAX_MEMBER_BYTES = 100 * 1024 * 1024
+ZIP_MAX_TOTAL_BYTES = 500 * 1024 * 1024
+ZIP_CHUNK_BYTES = 1024 * 1024
+
+# Paper types accepted inside a ZIP (nested ZIPs are not)
+ZIP_MEMBER_TYPES = {'.pdf', '.docx', '.doc'}
+
+# Papers from one ZIP parsed at once
+ZIP_WORKERS = min(4, os.cpu_count() or 1)
+
+
+# File types with their own parse timing series; anything else is "other"
+PARSED_TYPES = {'.pdf', '.docx', '.doc', '.zip'}
+
 
 def parse_input_file(file_path):
     ext = Path(file_path).suffix.lower()
+    with PARSE_SECONDS.time(file_type=ext.lstrip('.') if ext in PARSED_TYPES else "other"):
+        return parse_by_type(file_path, ext)
 
-    if ext == '.pdf':
-        parser = AcademicPDFParser()
-        pdf_result = parser.parse_pdf_direct(file_path)
 
-        if not parser.is_better_result(pdf_result, {"sections": [], "abstract": ""}):
-            docx_path = convert_pdf_to_docx(file_path)
-            if docx_path:
-                try:
-                    docx_result = parse_docx(docx_path)
-                    os.remove(docx_path)
-                    return docx_result if parser.is_better_result(docx_result, pdf_result) else pdf_result
-                except Exception as e:
-                    print(f"DOCX parsing failed: {e}")
-        return pdf_result
+def parse_by_type(file_path, ext):
+    if ext == '.pdf':
+        return parse_pdf(file_path)
 
     elif ext == '.docx':
         return parse_docx(file_path)
 
     elif ext == '.doc':
-        converted_path = convert_to_docx(file_path)
-        if converted_path:
-            return parse_docx(converted_path)
-        return {"error": "DOC conversion failed"}
+        return parse_doc(file_path)
 
     elif ext == '.zip':
         return parse_zip(file_path)
@@ -40,41 +69,268 @@ def parse_input_file(file_path):
         return {"error": "Unsupported file type"}
 
 
-def convert_pdf_to_docx(pdf_path):
-    docx_path = str(Path(pdf_path).with_suffix('.docx'))
+def parse_pdf(file_path, deadline=PDF_PARSE_DEADLINE):
+    """
+    Parse a PDF directly while pdf2docx converts it in a separate process.
+    A good direct result stops the conversion right away; otherwise the
+    conversion gets up to `deadline` seconds from its start and the better
+    of the two results wins.
+    """
+    parser = AcademicPDFParser()
+    conversion = DocxConversion(file_path, min(PDF2DOCX_PROCESSES, cpu_share()))
+    try:
+        pdf_result = None
+        try:
+            pdf_result = parser.parse_pdf_direct(file_path)
+        except Exception as e:
+            print(f"Direct PDF parsing failed: {e}")
+        if pdf_result is not None and parser.is_better_result(pdf_result, EMPTY_RESULT):
+            PARSE_STRATEGY.inc(strategy="direct")
+            return pdf_result
+
+        docx_result = None
+        docx_path = conversion.wait(deadline)
+        if docx_path:
+            try:
+                docx_result = parse_docx(docx_path)
+            except Exception as e:
+                print(f"DOCX parsing failed: {e}")
+    finally:
+        conversion.stop()
+
+    if docx_result is not None and parser.is_better_result(docx_result, pdf_result or EMPTY_RESULT):
+        PARSE_STRATEGY.inc(strategy="docx")
+        return docx_result
+    if pdf_result is not None:
+        PARSE_STRATEGY.inc(strategy="direct_weak")
+        return pdf_result
+    PARSE_STRATEGY.inc(strategy="docx_weak" if docx_result else "none")
+    return docx_result or {"error": "PDF parsing failed"}
+
+
+class DocxConversion:
+    """
+    pdf2docx converting one PDF in a child process (python -m utils.parsers)
+    with its own session, so the whole process group, including pdf2docx's
+    multi-processing workers, can be killed as soon as the result is not needed.
+    """
+
+    def __init__(self, pdf_path, processes=PDF2DOCX_PROCESSES):
+        self.workdir = tempfile.mkdtemp(prefix="pdf2docx-")
+        self.docx_path = os.path.join(self.workdir, "converted.docx")
+        self.log_path = os.path.join(self.workdir, "convert.log")
+        self.started = time.monotonic()
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+        try:
+            # The working directory is private too: pdf2docx's multi-processing
+            # mode writes its page files there
+            with open(self.log_path, "wb") as log:
+                self.process = subprocess.Popen(
+                    [sys.executable, "-m", "utils.parsers", os.path.abspath(pdf_path), self.docx_path, str(processes)],
+                    cwd=self.workdir, env=env, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                    start_new_session=True
+                )
+        except OSError as e:
+            print("PDF to DOCX conversion failed to start:", e)
+            self.process = None
+
+    def wait(self, deadline):
+        """Path of the converted DOCX, or None if it failed or missed the deadline"""
+        if self.process is None:
+            return None
+        remaining = max(0.0, deadline - (time.monotonic() - self.started))
+        try:
+            returncode = self.process.wait(timeout=remaining)
+        except subprocess.TimeoutExpired:
+            print(f"[WARN] PDF to DOCX conversion missed the {deadline}s deadline")
+            return None
+        if returncode != 0 or not os.path.exists(self.docx_path):
+            print("PDF to DOCX conversion failed:", self.log_tail())
+            return None
+        return self.docx_path
+
+    def log_tail(self, size=500):
+        try:
+            with open(self.log_path, "rb") as log:
+                return log.read()[-size:].decode("utf-8", "replace").strip()
+        except OSError:
+            return ""
+
+    def stop(self):
+        """Kill the conversion if it is still running and remove its files"""
+        if self.process is not None and self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self.process.wait()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def convert_pdf_to_docx(pdf_path, docx_path, processes=1):
+    """Run pdf2docx in this process (see DocxConversion for the usual entry point)"""
+    from pdf2docx import Converter
+
+    cv = Converter(pdf_path)
     try:
-        cv = Converter(pdf_path)
-        cv.convert(docx_path, start=0, end=None)
+        if processes > 1 and len(cv.fitz_doc) >= PARALLEL_EXTRACT_MIN_PAGES:
+            cv.convert(docx_path, start=0, end=None, multi_processing=True, cpu_count=processes)
+        else:
+            cv.convert(docx_path, start=0, end=None)
+    finally:
         cv.close()
-        return docx_path if os.path.exists(docx_path) else None
-    except Exception as e:
-        print("PDF to DOCX conversion failed:", e)
-        return None
 
 
-def convert_to_docx(input_path):
+def parse_doc(file_path):
+    """
+    Convert a .doc to DOCX in a private temporary directory and parse that.
+    Nothing is written next to the input (a real paper.docx beside paper.doc
+    is never overwritten) and the converted file is removed afterwards.
+    """
+    with tempfile.TemporaryDirectory(prefix="doc2docx-") as output_dir:
+        converted_path = convert_to_docx(file_path, output_dir)
+        if converted_path:
+            return parse_docx(converted_path)
+    return {"error": "DOC conversion failed"}
+
+
+def convert_to_docx(input_path, output_dir, timeout=DOC_CONVERSION_TIMEOUT):
+    """
+    Convert input_path with LibreOffice into output_dir; path of the DOCX or None.
+    Each conversion gets its own LibreOffice profile in output_dir (headless
+    instances sharing a profile quietly skip each other's conversions) and
+    its own session, so a hung soffice can be killed with its children.
+    """
+    profile_url = Path(output_dir, "libreoffice-profile").resolve().as_uri()
     try:
-        output_dir = str(Path(input_path).parent)
-        subprocess.run([
-            'soffice', '--headless', '--convert-to', 'docx', '--outdir', output_dir, input_path
-        ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        converted_path = str(Path(input_path).with_suffix('.docx'))
-        return converted_path if os.path.exists(converted_path) else None
-    except subprocess.CalledProcessError as e:
-        print("LibreOffice failed:", e)
-    except Exception as ex:
-        print("Conversion error:", ex)
+        process = subprocess.Popen([
+            'soffice', f'-env:UserInstallation={profile_url}', '--headless',
+            '--convert-to', 'docx', '--outdir', output_dir, os.path.abspath(input_path)
+        ], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, start_new_session=True)
+    except OSError as e:
+        print("Conversion error:", e)
+        return None
+
+    try:
+        output, _ = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.communicate()
+        print(f"[WARN] LibreOffice did not convert {Path(input_path).name} within {timeout}s")
+        return None
+
+    if process.returncode != 0:
+        print("LibreOffice failed:", output[-500:].decode("utf-8", "replace").strip())
+        return None
+    converted_path = os.path.join(output_dir, f"{Path(input_path).stem}.docx")
+    return converted_path if os.path.exists(converted_path) else None
+
+
+def iter_zip_documents(path, workers=ZIP_WORKERS):
+    """
+    Yield (member name, parsed result) for every paper in a ZIP archive.
+    Members are streamed to disk one at a time under the ZIP_* limits and
+    parsed in a process pool as soon as they are written, so results arrive
+    in completion order. Rejected members yield an error result.
+
+    Workers are spawned, not forked: this runs inside a threaded server, and
+    a forked child could inherit a lock some other thread was holding.
+    """
+    with tempfile.TemporaryDirectory() as tmpdirname, zipfile.ZipFile(path, 'r') as zip_ref:
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=share_cpus, initargs=(workers,)
+        )
+        futures = {}
+        try:
+            total_bytes = 0
+            for index, info in enumerate(zip_members(zip_ref)):
+                name = info.filename
+                if index >= ZIP_MAX_ENTRIES:
+                    yield name, {"error": f"ZIP has more than {ZIP_MAX_ENTRIES} papers; the rest were skipped"}
+                    break
+                if info.file_size > ZIP_MAX_MEMBER_BYTES:
+                    yield name, {"error": "File is too large"}
+                    continue
+
+                # Members are written under generated names so paths inside the
+                # archive ("../x.pdf", absolute paths) never leave tmpdirname
+                member_path = os.path.join(tmpdirname, f"{index:04d}{Path(name).suffix.lower()}")
+                limit = min(ZIP_MAX_MEMBER_BYTES, ZIP_MAX_TOTAL_BYTES - total_bytes)
+                written = extract_member(zip_ref, info, member_path, limit)
+                if written is None:
+                    if limit < ZIP_MAX_MEMBER_BYTES:
+                        yield name, {"error": "ZIP is too large; the rest were skipped"}
+                        break
+                    yield name, {"error": "File is too large"}
+                    continue
+
+                total_bytes += written
+                futures[pool.submit(parse_zip_member, member_path)] = name
+
+            for future in concurrent.futures.as_completed(futures):
+                name = futures[future]
+                try:
+                    result, recorded = future.result()
+                except Exception as e:
+                    print(f"Parsing {name} from ZIP failed: {e}")
+                    yield name, {"error": "Parsing failed"}
+                    continue
+                merge_metrics(recorded)
+                yield name, result
+        finally:
+            # Wait for running parses before the temporary directory goes away
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def parse_zip_member(file_path):
+    """Process pool task: parse one ZIP member and hand back the metrics it recorded"""
+    return parse_input_file(file_path), drain_metrics()
+
+
+def zip_members(zip_ref):
+    """Supported papers in archive order; folders, nested ZIPs and OS metadata are skipped"""
+    for info in zip_ref.infolist():
+        base = os.path.basename(info.filename)
+        if info.is_dir() or not base or base.startswith('.') or info.filename.startswith('__MACOSX/'):
+            continue
+        if Path(base).suffix.lower() in ZIP_MEMBER_TYPES:
+            yield info
+
+
+def count_zip_members(path):
+    with zipfile.ZipFile(path, 'r') as zip_ref:
+        return min(sum(1 for _ in zip_members(zip_ref)), ZIP_MAX_ENTRIES)
+
+
+def extract_member(zip_ref, info, target, limit):
+    """
+    Copy one member to target in chunks, counting the bytes actually
+    decompressed (the sizes in the header can lie). Returns the size, or
+    None after removing the partial file if it exceeds limit.
+    """
+    written = 0
+    with zip_ref.open(info) as source, open(target, 'wb') as out:
+        while True:
+            chunk = source.read(ZIP_CHUNK_BYTES)
+            if not chunk:
+                return written
+            written += len(chunk)
+            if written > limit:
+                break
+            out.write(chunk)
+    os.remove(target)
     return None
 
 
 def parse_zip(path):
-    import tempfile
-    parsed_results = []
-    with tempfile.TemporaryDirectory() as tmpdirname:
-        with zipfile.ZipFile(path, 'r') as zip_ref:
-            zip_ref.extractall(tmpdirname)
-            for name in zip_ref.namelist():
-                full_path = os.path.join(tmpdirname, name)
-                if os.path.isfile(full_path):
-                    parsed_results.append(parse_input_file(full_path))
+    parsed_results = [result for _, result in iter_zip_documents(path)]
     return {"zip_contents": parsed_results}
+
+
+# Child process of DocxConversion:  python -m utils.parsers <pdf> <docx> [processes]
+if __name__ == "__main__":
+    convert_pdf_to_docx(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 1)
@@ -151,14 +151,41 @@
 
 import os
 import re
-import fitz  # PyMuPDF
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from typing import Dict, List, Optional
-import spacy
-from pdf2docx import Converter
 
-# Load lightweight English model for NLP
-nlp = spacy.load("en_core_web_sm")
+# PyMuPDF, spaCy and pdf2docx are imported on first use so that importing
+# the app (e.g. a worker that only serves login or the dashboard) stays fast
+
+# Heading detection only needs POS tags, so skip the expensive components
+NLP_DISABLED_COMPONENTS = ["parser", "ner", "lemmatizer"]
+
+_nlp = None
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    """Load the lightweight English model for NLP on first use"""
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                import spacy
+                _nlp = spacy.load("en_core_web_sm", disable=NLP_DISABLED_COMPONENTS)
+    return _nlp
+
+# Lines are classified in nlp.pipe batches of this size
+NLP_BATCH_SIZE = 256
+
+# Bounded memo of NLP heading decisions; running headers repeat on every page
+NLP_CACHE_SIZE = 20000
+_heading_cache = OrderedDict()
+_heading_cache_lock = threading.Lock()
 
 # Configuration
 COMMON_SECTIONS = {
@@ -173,6 +200,98 @@ SECTION_PATTERNS = [
     r'^(?:APPENDIX|CHAPTER|SECTION)\s+.+$',  # Appendix A, Chapter 1, etc.
     r'^[IVXLCDM]+\.\s+.+$',  # Roman numerals
 ]
+SECTION_REGEXES = [re.compile(pattern, flags=re.IGNORECASE) for pattern in SECTION_PATTERNS]
+
+# PDFs with at least this many pages are extracted in a process pool
+PARALLEL_EXTRACT_MIN_PAGES = 40
+
+# Pages extracted per worker task
+PAGES_PER_CHUNK = 16
+
+# Worker processes for parallel extraction; None means this process's CPU share
+EXTRACT_WORKERS = int(os.environ["PDF_EXTRACT_WORKERS"]) if os.environ.get("PDF_EXTRACT_WORKERS") else None
+
+# CPUs this process may fan out over. Batch and ZIP worker processes each
+# get an equal share (see share_cpus), so nested pools don't multiply
+_cpu_share = os.cpu_count() or 1
+
+# One extraction pool per process, started on first use and reused. Spawned,
+# since extraction is requested from threads of a running server.
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+
+def share_cpus(parallel_workers):
+    """Process pool initializer for batch/ZIP workers running parallel_workers at a time"""
+    global _cpu_share
+    _cpu_share = max(1, (os.cpu_count() or 1) // max(1, parallel_workers))
+
+
+def cpu_share():
+    return _cpu_share
+
+
+def extract_worker_count():
+    return EXTRACT_WORKERS or cpu_share()
+
+
+def get_extract_pool():
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=extract_worker_count(), mp_context=multiprocessing.get_context("spawn")
+            )
+        return _extract_pool
+
+
+def discard_extract_pool(pool):
+    """Drop a broken pool (a worker died) so the next call starts a fresh one"""
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is pool:
+            _extract_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def clean_text(text: str) -> str:
+    """Remove unwanted artifacts from extracted text"""
+    # Remove line breaks in the middle of sentences
+    text = re.sub(r'(?<!\n)\n(?!\n)', ' ', text)
+    # Remove multiple spaces
+    text = re.sub(r'[ \t]{2,}', ' ', text)
+    # Remove special characters often from PDF artifacts
+    text = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', text)
+    return text.strip()
+
+
+def extract_page_blocks(page) -> List[str]:
+    """Cleaned text blocks of one page, minus headers and footers"""
+    clean_blocks = []
+    blocks = page.get_text("blocks", sort=True)
+    for block in blocks:
+        text = block[4].strip()
+        if not text or len(text.split()) < 2:
+            continue
+
+        # Skip headers/footers based on position
+        if (block[1] < 50 or block[3] > page.rect.height - 50) and len(text.split()) < 5:
+            continue
+
+        clean_blocks.append(clean_text(text))
+    return clean_blocks
+
+
+def extract_page_range(pdf_path: str, start: int, end: int) -> List[str]:
+    """Process pool task: open the PDF independently and extract pages [start, end)"""
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        clean_blocks = []
+        for page_number in range(start, end):
+            clean_blocks.extend(extract_page_blocks(doc[page_number]))
+        return clean_blocks
+
 
 class AcademicPDFParser:
     def __init__(self):
@@ -181,53 +300,94 @@ class AcademicPDFParser:
 
     def clean_text(self, text: str) -> str:
         """Remove unwanted artifacts from extracted text"""
-        # Remove line breaks in the middle of sentences
-        text = re.sub(r'(?<!\n)\n(?!\n)', ' ', text)
-        # Remove multiple spaces
-        text = re.sub(r'[ \t]{2,}', ' ', text)
-        # Remove special characters often from PDF artifacts
-        text = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', text)
-        return text.strip()
+        return clean_text(text)
 
     def extract_text_with_structure(self, pdf_path: str) -> str:
         """Improved text extraction that preserves logical structure"""
-        doc = fitz.open(pdf_path)
-        clean_blocks = []
-        
-        for page in doc:
-            blocks = page.get_text("blocks", sort=True)
-            for block in blocks:
-                text = block[4].strip()
-                if not text or len(text.split()) < 2:
-                    continue
-                    
-                # Skip headers/footers based on position
-                if (block[1] < 50 or block[3] > page.rect.height - 50) and len(text.split()) < 5:
-                    continue
-                    
-                clean_blocks.append(self.clean_text(text))
-        
+        import fitz  # PyMuPDF
+
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+            if page_count < PARALLEL_EXTRACT_MIN_PAGES or extract_worker_count() < 2:
+                clean_blocks = []
+                for page in doc:
+                    clean_blocks.extend(extract_page_blocks(page))
+                return "\n\n".join(clean_blocks)
+
+        # Large documents: extract page ranges in parallel, merged in page order
+        ranges = [
+            (start, min(start + PAGES_PER_CHUNK, page_count))
+            for start in range(0, page_count, PAGES_PER_CHUNK)
+        ]
+        pool = get_extract_pool()
+        try:
+            chunks = pool.map(
+                extract_page_range,
+                [os.path.abspath(pdf_path)] * len(ranges),
+                [start for start, _ in ranges],
+                [end for _, end in ranges],
+            )
+            clean_blocks = [block for chunk in chunks for block in chunk]
+        except BrokenProcessPool:
+            print("[WARN] PDF extraction pool broke, extracting in this process")
+            discard_extract_pool(pool)
+            clean_blocks = [
+                block for start, end in ranges for block in extract_page_range(pdf_path, start, end)
+            ]
+
         return "\n\n".join(clean_blocks)
 
-    def is_section_header(self, text: str) -> bool:
-        """Improved section header detection"""
+    def matches_heading_rules(self, text: str) -> bool:
+        """Cheap keyword and pattern checks for section headers"""
         text_lower = text.lower()
-        
+
         # Check against common section names
         if any(section in text_lower for section in COMMON_SECTIONS):
             return True
-            
+
         # Check structural patterns
-        if any(re.fullmatch(pattern, text, flags=re.IGNORECASE) for pattern in SECTION_PATTERNS):
+        return any(regex.fullmatch(text) for regex in SECTION_REGEXES)
+
+    def needs_nlp_check(self, text: str) -> bool:
+        return len(text.split()) <= 6 and not self.matches_heading_rules(text)
+
+    def classify_headings(self, texts: List[str]) -> None:
+        """Run the NLP heading check for many lines in one nlp.pipe batch"""
+        with _heading_cache_lock:
+            pending = list(dict.fromkeys(t for t in texts if t not in _heading_cache))
+        if not pending:
+            return
+
+        # Check for proper nouns or nouns that might be section headings
+        results = [
+            (text, any(token.pos_ in ["PROPN", "NOUN"] and token.text.istitle() for token in doc))
+            for text, doc in zip(pending, get_nlp().pipe(pending, batch_size=NLP_BATCH_SIZE))
+        ]
+
+        with _heading_cache_lock:
+            for text, is_heading in results:
+                _heading_cache[text] = is_heading
+            while len(_heading_cache) > NLP_CACHE_SIZE:
+                _heading_cache.popitem(last=False)
+
+    def nlp_heading_check(self, text: str) -> bool:
+        with _heading_cache_lock:
+            if text in _heading_cache:
+                _heading_cache.move_to_end(text)
+                return _heading_cache[text]
+        self.classify_headings([text])
+        with _heading_cache_lock:
+            return _heading_cache.get(text, False)
+
+    def is_section_header(self, text: str) -> bool:
+        """Improved section header detection"""
+        if self.matches_heading_rules(text):
             return True
-            
+
         # NLP-based check for short, important phrases
         if len(text.split()) <= 6:
-            doc = nlp(text)
-            # Check for proper nouns or nouns that might be section headings
-            if any(token.pos_ in ["PROPN", "NOUN"] and token.text.istitle() for token in doc):
-                return True
-                
+            return self.nlp_heading_check(text)
+
         return False
 
     def parse_pdf_direct(self, pdf_path: str) -> Dict:
@@ -245,7 +405,17 @@ class AcademicPDFParser:
         
         self.current_section = None
         self.in_references = False
-        
+
+        # Classify every line that may need the NLP check in one batch,
+        # so the loop below only hits the memo
+        candidates = []
+        for line in lines:
+            if re.match(r'^references\b', line, re.I):
+                break
+            if self.needs_nlp_check(line):
+                candidates.append(line)
+        self.classify_headings(candidates)
+
         i = 0
         while i < len(lines):
             line = lines[i]
@@ -313,6 +483,8 @@ class AcademicPDFParser:
         docx_path = str(Path(pdf_path).with_suffix('.docx'))
         
         try:
+            from pdf2docx import Converter
+
             cv = Converter(pdf_path)
             cv.convert(
                 docx_path,
@@ -0,0 +1,225 @@
+# utils/profiling.py
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from .disk_cache import enforce_size_limit
+
+# Profiles and their metadata are written here
+PROFILE_DIR = "profiles"
+PROFILE_DIR_MAX_BYTES = 200 * 1024 * 1024
+
+# Users allowed to request profiles and download them (comma separated emails)
+ADMIN_EMAILS = {
+    email.strip().lower() for email in os.environ.get("ADMIN_EMAILS", "").split(",") if email.strip()
+}
+
+# Routes profiled for admins without the X-Profile header, as
+# "endpoint[=mode],...", e.g. IEEE_PROFILE_ROUTES="generate_pdf,upload=sample"
+PROFILE_ROUTES = {}
+for _entry in os.environ.get("IEEE_PROFILE_ROUTES", "").split(","):
+    if _entry.strip():
+        _endpoint, _, _mode = _entry.strip().partition("=")
+        PROFILE_ROUTES[_endpoint] = _mode or "cprofile"
+
+# cprofile: deterministic, one thread, saved as .pstats (snakeviz, pstats)
+# sample: stack sampling across threads, saved as collapsed stacks (flamegraph.pl, speedscope)
+PROFILE_MODES = {"cprofile": ".pstats", "sample": ".folded"}
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+
+# Innermost frames of threads that are just parked waiting for work
+IDLE_FRAMES = {
+    ("threading.py", "wait"), ("thread.py", "_worker"), ("queue.py", "get"),
+    ("selectors.py", "select"), ("socketserver.py", "serve_forever"),
+}
+
+
+def is_admin(email):
+    return bool(email) and email.lower() in ADMIN_EMAILS
+
+
+def profile_mode(value):
+    """Map an X-Profile header value ("1", "cprofile", "sample") to a mode, or None"""
+    value = (value or "").strip().lower()
+    if value in PROFILE_MODES:
+        return value
+    if value in ("1", "true", "yes"):
+        return "cprofile"
+    return None
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread in the process. The target thread is
+    always recorded; other threads only when they are doing something.
+    """
+
+    def __init__(self, target_thread_id, interval=SAMPLE_INTERVAL):
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                code = frame.f_code
+                if thread_id != self.target_thread_id and \
+                        (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Profile:
+    """
+    One profiled request or job. start() and stop() must be called from the
+    thread being profiled; save() writes the profile plus a JSON record with
+    the label, owner, temp ids and stage timings.
+    """
+
+    def __init__(self, mode, kind, label, owner):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.kind = kind
+        self.label = label
+        self.owner = owner
+        self.started_at = None
+        self.duration = None
+        self._started = None
+        self._profiler = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        if self.mode == "sample":
+            self._profiler = SamplingProfiler(threading.get_ident())
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # Another profiler is already active in this thread
+                self._profiler = None
+
+    def stop(self):
+        if self._profiler is not None:
+            if self.mode == "sample":
+                self._profiler.stop()
+            else:
+                self._profiler.disable()
+        self.duration = round(time.perf_counter() - self._started, 4)
+
+    def save(self, temp_ids=(), stage_timings=None, status=None):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile_path = os.path.join(PROFILE_DIR, f"{self.id}{PROFILE_MODES[self.mode]}")
+        if self.mode == "sample" and self._profiler is not None:
+            self._profiler.dump(profile_path)
+        elif self._profiler is not None:
+            self._profiler.dump_stats(profile_path)
+
+        record = {
+            "profile_id": self.id,
+            "mode": self.mode,
+            "kind": self.kind,
+            "label": self.label,
+            "owner": self.owner,
+            "temp_ids": [temp_id for temp_id in temp_ids if temp_id],
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "stage_timings": stage_timings or {},
+            "status": status,
+            "file": os.path.basename(profile_path) if os.path.exists(profile_path) else None,
+        }
+        with open(os.path.join(PROFILE_DIR, f"{self.id}.json"), "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        enforce_size_limit(PROFILE_DIR, PROFILE_DIR_MAX_BYTES)
+        return record
+
+
+def profile_job(label, owner, fn, mode="sample"):
+    """
+    Wrap a job function so the job runs under a profiler in its worker
+    thread. Returns (profile, wrapped function).
+
+    Jobs are sampled by default: cProfile only sees the job's own thread,
+    while the image and extraction thread pools it hands work to show up
+    in the samples. Work in child processes is not covered in either mode:
+    ZIP members are parsed in spawned processes and pdf2docx converts in a
+    subprocess, so a profile only shows the job waiting on them.
+    """
+    profile = Profile(mode, "job", label, owner)
+
+    def run(job, *args, **kwargs):
+        profile.start()
+        status = "failed"
+        result = None
+        try:
+            result = fn(job, *args, **kwargs)
+            status = "done"
+            return result
+        finally:
+            profile.stop()
+            temp_ids = result.get("temp_ids", []) if isinstance(result, dict) else []
+            profile.save(temp_ids, job.timings(), status)
+
+    return profile, run
+
+
+def list_profiles(limit=100):
+    """Newest profile records first"""
+    records = []
+    try:
+        names = [name for name in os.listdir(PROFILE_DIR) if name.endswith(".json")]
+    except FileNotFoundError:
+        return []
+    for name in names:
+        try:
+            with open(os.path.join(PROFILE_DIR, name), "r", encoding="utf-8") as f:
+                records.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    records.sort(key=lambda record: record.get("started_at") or 0, reverse=True)
+    return records[:limit]
+
+
+def profile_file(profile_id):
+    """Path of a stored profile, or None; profile_id is checked so it can't escape PROFILE_DIR"""
+    if not profile_id.isalnum():
+        return None
+    for suffix in PROFILE_MODES.values():
+        path = os.path.join(PROFILE_DIR, f"{profile_id}{suffix}")
+        if os.path.exists(path):
+            return path
+    return None
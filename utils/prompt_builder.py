@@ -0,0 +1,189 @@
+# utils/prompt_builder.py
+
+import json
+import re
+import threading
+
+from .metrics import PROMPT_TOKENS, PROMPT_TRUNCATIONS
+from .ollama_client import context_tokens
+
+# Rough size of a token for English prose; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Share of a model's context window a prompt may use; longer text is split
+# or, for titles, trimmed. The rest is left for the answer, which for a
+# rewritten passage is about as long as the input, with slack for the
+# rough token estimate (3k of llama3's 8k)
+PROMPT_CONTEXT_SHARE = 3 / 8
+
+# Fields the model needs to format a paper; everything else is dropped
+DOCUMENT_FIELDS = ["title", "abstract", "keywords"]
+
+IMAGE_MARKER_PATTERN = re.compile(r'\[IMAGE:\s*.*?\]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+SENTENCE_END_PATTERN = re.compile(r'[.!?](?=\s)')
+SENTENCE_SPLIT_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def token_budget(model):
+    """Input tokens a prompt for model may use (see PROMPT_CONTEXT_SHARE)"""
+    return int(context_tokens(model) * PROMPT_CONTEXT_SHARE)
+
+
+def clean_text(text):
+    """Drop image markers and collapse whitespace"""
+    text = IMAGE_MARKER_PATTERN.sub(" ", text or "")
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def truncate_text(text, max_tokens):
+    """Cut text to about max_tokens, preferring a sentence, then a word boundary"""
+    max_chars = max(0, max_tokens) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+
+    cut = text[:max_chars]
+    sentence_ends = [m.end() for m in SENTENCE_END_PATTERN.finditer(cut)]
+    if sentence_ends and sentence_ends[-1] > max_chars // 2:
+        return cut[:sentence_ends[-1]]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > max_chars // 2 else cut).rstrip() + " …"
+
+
+def split_text(text, max_tokens):
+    """
+    Split text into cleaned pieces of about max_tokens at most, breaking
+    between paragraphs where possible, then between sentences, then at
+    spaces. Unlike truncate_text, nothing is dropped.
+    """
+    max_chars = max(1, max_tokens) * CHARS_PER_TOKEN
+
+    units = []
+    for paragraph in (text or "").split("\n"):
+        paragraph = clean_text(paragraph)
+        if len(paragraph) <= max_chars:
+            if paragraph:
+                units.append(paragraph)
+            continue
+        for sentence in SENTENCE_SPLIT_PATTERN.split(paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars + 1)
+                if cut <= 0:
+                    cut = max_chars
+                units.append(sentence[:cut].rstrip())
+                sentence = sentence[cut:].lstrip()
+            if sentence:
+                units.append(sentence)
+
+    # Pack whole units into pieces as large as the budget allows
+    pieces = []
+    current = ""
+    for unit in units:
+        if current and len(current) + 1 + len(unit) > max_chars:
+            pieces.append(current)
+            current = unit
+        else:
+            current = f"{current} {unit}" if current else unit
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def compact_document(parsed_data):
+    """The parts of a parsed paper the model needs, with image markers stripped"""
+    document = {field: clean_text(parsed_data.get(field, "")) for field in DOCUMENT_FIELDS}
+    document["sections"] = [
+        {
+            "heading": clean_text(section.get("heading", "")),
+            "content": clean_text(section.get("content", "")),
+            "subsections": [
+                {"heading": clean_text(sub.get("heading", "")), "content": clean_text(sub.get("content", ""))}
+                for sub in section.get("subsections", [])
+            ],
+        }
+        for section in parsed_data.get("sections", [])
+    ]
+    return document
+
+
+def serialize(document):
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":"))
+
+
+def record_prompt(call_site, model, prompt, trimmed_from=None):
+    """Keep per call site counts and estimated input tokens of every prompt built"""
+    tokens = estimate_tokens(prompt)
+    PROMPT_TOKENS.observe(tokens, call_site=call_site)
+    if trimmed_from:
+        PROMPT_TRUNCATIONS.inc(call_site=call_site)
+    with _stats_lock:
+        stats = _stats.setdefault(call_site, {
+            "calls": 0, "estimated_tokens": 0, "max_tokens": 0, "last_tokens": 0, "trimmed": 0,
+        })
+        stats["calls"] += 1
+        stats["estimated_tokens"] += tokens
+        stats["max_tokens"] = max(stats["max_tokens"], tokens)
+        stats["last_tokens"] = tokens
+        if trimmed_from:
+            stats["trimmed"] += 1
+    return tokens
+
+
+def prompt_stats():
+    with _stats_lock:
+        return {call_site: dict(stats) for call_site, stats in _stats.items()}
+
+
+def document_fits(parsed_data, model, instructions=""):
+    """Whether the compact document fits the model's budget as a single prompt"""
+    document = compact_document(parsed_data)
+    available = token_budget(model) - estimate_tokens(instructions) - 8
+    return estimate_tokens(serialize(document)) <= available
+
+
+def build_document_prompt(call_site, model, instructions, parsed_data):
+    """
+    Instructions plus the compact JSON of a paper. Nothing is trimmed;
+    check document_fits first and split papers that do not fit.
+    """
+    document = compact_document(parsed_data)
+    prompt = f"{instructions}\n\nParsed Data:\n{serialize(document)}"
+    record_prompt(call_site, model, prompt)
+    return prompt
+
+
+def build_text_prompts(call_site, model, instructions, text):
+    """
+    Instructions plus cleaned text: one prompt if it fits the model's budget,
+    otherwise one prompt per piece of the text (see split_text), in order
+    """
+    available = token_budget(model) - estimate_tokens(instructions) - 8
+    prompts = [f"{instructions}{piece}\n" for piece in split_text(text, available)]
+    for prompt in prompts:
+        record_prompt(call_site, model, prompt)
+    return prompts
+
+
+def build_text_prompt(call_site, model, instructions, text, max_tokens=None):
+    """
+    Instructions plus cleaned text, trimmed to max_tokens or the model's
+    budget. Only for call sites that can lose the tail of the text (titles);
+    use build_text_prompts for anything that must be kept whole.
+    """
+    text = clean_text(text)
+    available = token_budget(model) - estimate_tokens(instructions) - 8
+    if max_tokens is not None:
+        available = min(available, max_tokens)
+
+    full_tokens = estimate_tokens(text)
+    prompt = f"{instructions}{truncate_text(text, available)}\n"
+    trimmed_from = full_tokens if full_tokens > available else None
+    record_prompt(call_site, model, prompt, trimmed_from)
+    return prompt
@@ -0,0 +1,140 @@
+# utils/serving.py
+
+import os
+import threading
+
+# Native threads that run blocking work (pdflatex, bcrypt, model calls)
+# while the gevent server keeps serving other requests
+BLOCKING_THREADS = int(os.environ.get("IEEE_BLOCKING_THREADS", "32"))
+
+_gevent_enabled = False
+_hub = None
+_db_thread = None
+_DONE = object()
+
+
+def patch_for_gevent():
+    """
+    Make sockets, DNS, select and sleep cooperative. Must run before anything
+    else is imported. Threads and subprocess stay native: the job queue,
+    parser pools and pdflatex keep running on real OS threads.
+
+    A cooperative socket belongs to the hub of the thread that created it,
+    so shared network clients are only ever used on the main thread's hub:
+    native threads reach them through on_hub(). MongoDB is the exception,
+    see run_db().
+    """
+    global _gevent_enabled, _hub
+    from gevent import monkey
+
+    monkey.patch_all(thread=False, subprocess=False)
+    import gevent
+
+    _hub = gevent.get_hub()
+    _hub.threadpool.maxsize = BLOCKING_THREADS
+    _gevent_enabled = True
+
+
+def run_blocking(fn, *args, **kwargs):
+    """
+    Call fn without holding up other requests: under gevent it runs in the
+    hub's native threadpool while this greenlet waits; otherwise (the
+    Flask dev server, worker threads) it is simply called.
+    """
+    if not _gevent_enabled or threading.current_thread() is not threading.main_thread():
+        return fn(*args, **kwargs)
+    import gevent
+
+    return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+
+
+def run_db(fn, *args, **kwargs):
+    """
+    Call fn, which uses pymongo, on the one native thread that owns the
+    MongoDB connection pool. pymongo waits for free or connecting sockets on
+    native threading.Conditions; on the hub that wait would freeze every
+    greenlet, while a single thread never waits on itself. Native threads
+    hand the call over through on_hub(); without gevent fn is simply called.
+    Return plain values (a list, not a cursor) so no I/O happens afterwards.
+    """
+    global _db_thread
+    if not _gevent_enabled:
+        return fn(*args, **kwargs)
+    if threading.current_thread() is not threading.main_thread():
+        return on_hub(run_db, fn, *args, **kwargs)
+    if _db_thread is None:
+        from gevent.threadpool import ThreadPool
+
+        _db_thread = ThreadPool(1)
+    return _db_thread.apply(fn, args, kwargs)
+
+
+def iterate_blocking(iterable):
+    """Yield from a blocking iterator, fetching each item with run_blocking"""
+    iterator = iter(iterable)
+    try:
+        while True:
+            item = run_blocking(next, iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            run_blocking(close)
+
+
+def on_hub(fn, *args, **kwargs):
+    """
+    Call fn in a greenlet on the main thread's hub and wait for the result.
+    Network calls made from native threads (job queue, run_blocking, pools)
+    go through here, so pooled Ollama sockets are never used from two
+    threads. Without gevent, or on the main thread, fn is simply called.
+    """
+    if not _gevent_enabled or threading.current_thread() is threading.main_thread():
+        return fn(*args, **kwargs)
+    import gevent
+
+    done = threading.Event()
+    outcome = {}
+
+    def call():
+        try:
+            outcome["value"] = fn(*args, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            done.set()
+
+    _hub.loop.run_callback_threadsafe(gevent.spawn, call)
+    done.wait()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
+
+
+def iterate_on_hub(iterable):
+    """Yield from an iterator that does network I/O, advancing it with on_hub"""
+    iterator = iter(iterable)
+    try:
+        while True:
+            item = on_hub(next, iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            on_hub(close)
+
+
+def bounded_semaphore(value):
+    """
+    A BoundedSemaphore for code that runs on the hub under gevent (waiting
+    there must yield to other greenlets, not block the whole thread)
+    """
+    if _gevent_enabled:
+        from gevent.lock import BoundedSemaphore
+
+        return BoundedSemaphore(value)
+    return threading.BoundedSemaphore(value)
@@ -1,41 +1,53 @@
-import subprocess
 import re
+from . import llm_cache
+from .ollama_client import get_client
+from .prompt_builder import build_text_prompt, clean_text
 
-def suggest_titles(doc_data):
+# Small, fast model is enough for title suggestions
+TITLE_MODEL = "phi3:mini"
+
+# Bump when the prompt below changes so cached titles are not reused
+TITLE_PROMPT_VERSION = "2"
+
+# An introduction's opening is enough context for a title
+TITLE_CONTEXT_TOKENS = 400
+
+def suggest_titles(doc_data, refresh=False):
     # Step 1: Extract intro or fallback to abstract/first section
     intro_text = ""
     sections = doc_data.get("sections", [])
     if sections:
-        intro_text = sections[0].get("content", "")[:1500].strip()
+        intro_text = clean_text(sections[0].get("content", ""))
     if not intro_text:
-        intro_text = doc_data.get("abstract", "")[:1500].strip()
+        intro_text = clean_text(doc_data.get("abstract", ""))
     if not intro_text:
         return ["No sufficient content found to suggest titles."]
 
-    # Step 2: Create structured prompt
-    prompt = f"""You are a research assistant. Based on the content below, generate 4 IEEE-style academic paper titles. Each title must be clear, concise (max 15 words), and on a new line.
+    # Step 2: Create structured prompt, trimmed at a sentence boundary
+    instructions = """You are a research assistant. Based on the content below, generate 4 IEEE-style academic paper titles. Each title must be clear, concise (max 15 words), and on a new line.
 
 --- Content ---
-{intro_text}
 """
+    prompt = build_text_prompt("titles", TITLE_MODEL, instructions, intro_text, max_tokens=TITLE_CONTEXT_TOKENS)
+
+    key = llm_cache.cache_key(TITLE_MODEL, None, TITLE_PROMPT_VERSION, prompt)
+    cached = llm_cache.lookup(key, refresh=refresh)
+    if cached is not None:
+        return cached
 
     try:
-        result = subprocess.run(
-            ["ollama", "run", "phi3:mini"],  # Use your model name here
-            input=prompt,
-            text=True,
-            capture_output=True,
-            timeout=180
-        )
-        output = result.stdout.strip()
+        output = get_client().generate(TITLE_MODEL, prompt).strip()
 
         # Step 3: Post-process: remove bullets/numbers and trim
         lines = [re.sub(r"^[•\-–\d.]+", "", line).strip() for line in output.splitlines() if line.strip()]
         titles = [line for line in lines if 10 < len(line) < 150]
 
         # Step 4: Pad or trim to 4 titles
+        generated = bool(titles)
         while len(titles) < 4:
             titles.append(f"Generated Title {len(titles)+1}")
+        if generated:
+            llm_cache.store(key, titles[:4])
         return titles[:4]
 
     except Exception as e:
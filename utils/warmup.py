@@ -0,0 +1,51 @@
+# utils/warmup.py
+
+import importlib
+import threading
+import time
+
+from .llm_formatter import IEEE_MODEL
+from .ollama_client import get_client
+from .title_suggested import TITLE_MODEL
+
+# Parser libraries that are otherwise imported on the first upload
+HEAVY_MODULES = ["fitz", "docx", "pdf2docx"]
+
+
+def ping_model(model):
+    """Ask Ollama to load a model so the first real prompt doesn't wait for it"""
+    try:
+        get_client().load(model)
+        return True
+    except Exception as e:
+        print(f"[WARMUP] Could not reach model {model}: {e}")
+        return False
+
+
+def warm_up():
+    """Preload parser libraries, the spaCy model and the local LLMs"""
+    from .pdf_parser import get_nlp
+
+    started = time.perf_counter()
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"[WARMUP] Failed to import {name}: {e}")
+
+    try:
+        get_nlp()
+    except Exception as e:
+        print("[WARMUP] Failed to load spaCy model:", e)
+
+    for model in dict.fromkeys([TITLE_MODEL, IEEE_MODEL]):
+        ping_model(model)
+
+    print(f"[WARMUP] Done in {time.perf_counter() - started:.1f}s")
+
+
+def start_warmup():
+    """Run warm_up in a background thread so startup isn't delayed"""
+    thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+    thread.start()
+    return thread
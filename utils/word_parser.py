@@ -1,8 +1,8 @@
-import docx
 import re
 import os
 from uuid import uuid4
 import base64
+from .image_store import submit_image_bytes
 
 COMMON_SECTIONS = [
     "introduction", "literature review", "related work", "methodology",
@@ -45,6 +45,8 @@ def save_image_run(run, image_dir, prefix="img"):
 
 
 def parse_docx(path):
+    import docx  # python-docx, loaded on first use
+
     doc = docx.Document(path)
 
     result = {
@@ -63,9 +65,19 @@ def parse_docx(path):
     author_block_ended = False
     author_detected = False
 
-    # Prepare directory for saving images
-    image_dir = f'static/images/{uuid4().hex[:8]}'
-    os.makedirs(image_dir, exist_ok=True)
+    # Store every embedded image up front, in parallel; identical images
+    # (logos repeated across papers) are only written once
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+
+    # relationship id -> stored web path (future); ids sharing a part share the future
+    part_futures = {}
+    image_futures = {}
+    for rel in doc.part.rels.values():
+        if rel.reltype == RT.IMAGE and not rel.is_external:
+            part = rel.target_part
+            if id(part) not in part_futures:
+                part_futures[id(part)] = submit_image_bytes(part.blob)
+            image_futures[rel.rId] = part_futures[id(part)]
 
     for para in doc.paragraphs:
         full_text = ""
@@ -73,17 +85,12 @@ def parse_docx(path):
             if run.text:
                 full_text += run.text
 
-            # Check for images in the run
-            if run.element.xpath(".//pic:pic"):
-                rels = run.part.rels
-                for rel in rels.values():
-                    if hasattr(rel._target, 'blob'):
-                        image_id = str(uuid4())[:8]
-                        image_path = os.path.join(image_dir, f"{image_id}.png")
-                        with open(image_path, "wb") as img_file:
-                            img_file.write(rel._target.blob)
-                        full_text += f' [IMAGE: /{image_path.replace("\\", "/")}] '
-                        break
+            # Images in the run, resolved through the relationship id each picture embeds
+            for embed_id in run.element.xpath(".//a:blip/@r:embed"):
+                future = image_futures.get(embed_id)
+                web_path = future.result() if future else None
+                if web_path:
+                    full_text += f' [IMAGE: {web_path}] '
 
         text = full_text.strip()
         if not text: